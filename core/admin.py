@@ -1,14 +1,120 @@
+from django import forms
 from django.contrib import admin
-from .models import Category, Product, SaleTransaction, SaleItem, Staff, Restock, Customer, CustomerTransaction, LoyaltySettings, BulkDiscount, StoreSettings
+from django.db import transaction
+from .models import Category, Product, SaleTransaction, SaleItem, Staff, Restock, Customer, CustomerTransaction, LoyaltySettings, BulkDiscount, StoreSettings, StockMovement
+from .catalogue import record_change, record_pre_deletion
+from .rollups import remove_sale
+from .stock import adjust_stock, record_initial_stock
 from django.contrib.auth.admin import UserAdmin
 from django.utils.translation import gettext_lazy as _
 # Register your models here.
 
 
-admin.site.register(Category)
-admin.site.register(Product)
-admin.site.register(SaleTransaction)
-admin.site.register(SaleItem)
+class CatalogueChangeAdmin(admin.ModelAdmin):
+    """Admin counterpart of CatalogueChangeMixin: admin writes reach the terminal change feed too."""
+
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            record_change(obj)
+
+    def delete_model(self, request, obj):
+        pk = obj.pk
+        with transaction.atomic():
+            record_pre_deletion(obj)
+            super().delete_model(request, obj)
+            record_change(obj, pk)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            objs = list(queryset)
+            for obj in objs:
+                record_pre_deletion(obj)
+            pks = [obj.pk for obj in objs]
+            super().delete_queryset(request, queryset)
+            for obj, pk in zip(objs, pks):
+                record_change(obj, pk)
+
+
+@admin.register(Category)
+class CategoryAdmin(CatalogueChangeAdmin):
+    pass
+
+
+class ProductAdminForm(forms.ModelForm):
+    # The stock shown when the form was loaded, posted back so an edit can be
+    # applied as a change instead of overwriting sales made meanwhile
+    expected_stock = forms.IntegerField(widget=forms.HiddenInput, required=False)
+
+    class Meta:
+        model = Product
+        fields = '__all__'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            self.fields['expected_stock'].initial = self.instance.stock
+
+
+@admin.register(Product)
+class ProductAdmin(CatalogueChangeAdmin):
+    form = ProductAdminForm
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            with transaction.atomic():
+                super().save_model(request, obj, form, change)
+                record_initial_stock([obj], StockMovement.OPENING, user=request.user)
+            return
+        # Stock moves through the ledger by the change made in the form, so
+        # sales since the form was loaded are neither overwritten nor lost
+        expected = form.cleaned_data.get('expected_stock')
+        delta = obj.stock - (form.initial['stock'] if expected is None else expected)
+        with transaction.atomic():
+            obj.save(update_fields=[f.name for f in obj._meta.concrete_fields if not f.primary_key and f.name != 'stock'])
+            record_change(obj)
+            if delta:
+                obj.stock = adjust_stock(obj.pk, delta, StockMovement.ADJUSTMENT, user=request.user)
+
+class SaleItemInline(admin.TabularInline):
+    model = SaleItem
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SaleTransaction)
+class SaleTransactionAdmin(admin.ModelAdmin):
+    """
+    Sales and their lines are read-only here: the daily rollup and today's
+    counters are kept in step by checkout, which an edit would bypass.
+    Deleting a sale takes it back out of the rollup first, as the API does.
+    """
+    list_display = ['id', 'created_at', 'cashier', 'customer', 'total_amount']
+    inlines = [SaleItemInline]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            remove_sale(obj)
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            for sale in queryset:
+                remove_sale(sale)
+            super().delete_queryset(request, queryset)
+
 admin.site.register(Restock)
 admin.site.register(Customer)
 admin.site.register(CustomerTransaction)
@@ -37,7 +143,7 @@ class StoreSettingsAdmin(admin.ModelAdmin):
 
 
 @admin.register(BulkDiscount)
-class BulkDiscountAdmin(admin.ModelAdmin):
+class BulkDiscountAdmin(CatalogueChangeAdmin):
     list_display = ['name', 'product', 'discount_type', 'minimum_quantity', 'discount_value', 'is_active', 'start_date', 'end_date']
     list_filter = ['discount_type', 'is_active', 'start_date']
     search_fields = ['name', 'product__name']
\ No newline at end of file
@@ -0,0 +1,95 @@
+"""
+Barcode lookup for the till.
+
+A bounded per-worker LRU maps barcode -> compact pricing payload so scanner
+bursts do not re-read products, categories and discounts on every beep.
+Entries are dropped wholesale when the catalogue's pricing version moves.
+That version is re-read at most once every VERSION_CHECK_SECONDS per worker.
+Stock is not cached: it is read fresh for every request.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from .catalogue import catalogue_queryset, pricing_version
+from .models import Product
+
+BARCODE_CACHE_SIZE = 5000
+VERSION_CHECK_SECONDS = 2
+MAX_BATCH_BARCODES = 200
+
+
+def compact_product(product):
+    return {
+        'id': product.id,
+        'name': product.name,
+        'barcode': product.barcode,
+        'category': product.category.name if product.category else None,
+        'price': str(product.price),
+        'unit_price': product.unit_price,
+        'unit_of_measure': product.unit_of_measure,
+        'is_bulk_product': product.is_bulk_product,
+        'bulk_quantity': product.bulk_quantity,
+        'bulk_price': str(product.bulk_price) if product.bulk_price is not None else None,
+        'bulk_discounts': [
+            {
+                'id': d.id,
+                'name': d.name,
+                'discount_type': d.discount_type,
+                'minimum_quantity': d.minimum_quantity,
+                'discount_value': str(d.discount_value),
+            }
+            for d in product.active_bulk_discounts
+        ],
+    }
+
+
+class BarcodeCache:
+    def __init__(self, size=BARCODE_CACHE_SIZE):
+        self.size = size
+        self._entries = OrderedDict()  # barcode -> payload, or None for unknown codes
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _check_version(self):
+        now = time.monotonic()
+        if now - self._checked_at < VERSION_CHECK_SECONDS:
+            return
+        version = pricing_version()
+        with self._lock:
+            self._checked_at = now
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+
+    def lookup(self, barcodes):
+        """{barcode: payload or None} for every requested code, with fresh stock."""
+        self._check_version()
+
+        found, missing = {}, []
+        with self._lock:
+            for code in barcodes:
+                if code in self._entries:
+                    self._entries.move_to_end(code)
+                    found[code] = self._entries[code]
+                else:
+                    missing.append(code)
+
+        if missing:
+            loaded = {p.barcode: compact_product(p) for p in catalogue_queryset().filter(barcode__in=missing)}
+            with self._lock:
+                for code in missing:
+                    found[code] = self._entries[code] = loaded.get(code)
+                while len(self._entries) > self.size:
+                    self._entries.popitem(last=False)
+
+        ids = [payload['id'] for payload in found.values() if payload]
+        stock = dict(Product.objects.filter(pk__in=ids).values_list('pk', 'stock'))
+        return {
+            code: {**payload, 'stock': stock.get(payload['id'], 0)} if payload else None
+            for code, payload in found.items()
+        }
+
+
+barcode_cache = BarcodeCache()
@@ -0,0 +1,142 @@
+"""
+Catalogue change tracking for POS terminals.
+
+Every write to a product, category or bulk discount appends a CatalogueChange
+row inside the same transaction. The highest row id is the catalogue version,
+so a terminal can ask for "everything since version N" and receive only the
+objects that changed — including deletions — instead of the full catalogue.
+"""
+from datetime import timedelta
+
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from .models import Category, Product, BulkDiscount, CatalogueChange
+
+FEED_SETTLE_SECONDS = 10
+
+CATALOGUE_MODELS = {
+    'Product': Product,
+    'Category': Category,
+    'BulkDiscount': BulkDiscount,
+}
+
+
+def catalogue_queryset():
+    """Products with everything ProductSerializer reads, in a fixed number of queries."""
+    return Product.objects.select_related('category').prefetch_related(BulkDiscount.active_prefetch())
+
+
+def record_changes(model_name, object_ids, stock_only=False):
+    """Append one feed row per object. Call inside the writing transaction."""
+    CatalogueChange.objects.bulk_create([
+        CatalogueChange(model_name=model_name, object_id=pk, stock_only=stock_only) for pk in set(object_ids)
+    ])
+
+
+def record_change(instance, pk=None):
+    """Record a write to instance. Deletes pass the pk, which the instance has lost by then."""
+    model_name = instance.__class__.__name__
+    if model_name not in CATALOGUE_MODELS:
+        return
+    record_changes(model_name, [pk or instance.pk])
+    if model_name == 'BulkDiscount':
+        # Products embed their active discounts, so the product changed too
+        record_changes('Product', [instance.product_id])
+    elif model_name == 'Category' and pk is None:
+        # Products embed their category's name, so renaming it changes them all
+        # (a delete has recorded them already, in record_pre_deletion)
+        record_changes('Product', Product.objects.filter(category_id=instance.pk).values_list('pk', flat=True))
+
+
+def record_pre_deletion(instance):
+    """Record the rows a delete will cascade to or null out, while they can still be found."""
+    model_name = instance.__class__.__name__
+    if model_name == 'Category':
+        record_changes('Product', Product.objects.filter(category_id=instance.pk).values_list('pk', flat=True))
+    elif model_name == 'Product':
+        record_changes('BulkDiscount', instance.bulk_discounts.values_list('pk', flat=True))
+
+
+def current_version():
+    return CatalogueChange.objects.aggregate(version=Max('id'))['version'] or 0
+
+
+def discount_epoch():
+    """
+    Latest discount start/end boundary that has already passed. Discounts go
+    live and expire by the clock rather than by a write, so this moves the
+    catalogue ETag when that happens.
+    """
+    now = timezone.now()
+    bounds = BulkDiscount.objects.aggregate(
+        started=Max('start_date', filter=Q(start_date__lte=now)),
+        ended=Max('end_date', filter=Q(end_date__lte=now)),
+    )
+    return max((b for b in bounds.values() if b), default=None)
+
+
+def catalogue_etag():
+    """Strong validator for anything rendered from products, categories or discounts."""
+    epoch = discount_epoch()
+    return f'"catalogue-{current_version()}-{int(epoch.timestamp()) if epoch else 0}"'
+
+
+def pricing_version():
+    """
+    Changes to anything but stock levels: (latest non-stock version, discount
+    epoch). Lets price caches survive the stream of stock-only rows that every
+    sale writes.
+    """
+    latest = (
+        CatalogueChange.objects.filter(stock_only=False)
+        .order_by('-id').values_list('id', flat=True).first()
+    )
+    return latest or 0, discount_epoch()
+
+
+def settled_version():
+    """
+    Highest version a terminal can safely resume from. Ids are handed out at
+    insert time but become visible at commit, so a slow transaction can commit
+    a lower id after a higher one; only rows older than FEED_SETTLE_SECONDS
+    are treated as final.
+    """
+    cutoff = timezone.now() - timedelta(seconds=FEED_SETTLE_SECONDS)
+    settled = (
+        CatalogueChange.objects.filter(changed_at__lte=cutoff)
+        .order_by('-id').values_list('id', flat=True).first()
+    )
+    return settled or 0
+
+
+def oldest_version():
+    """Versions below this have been pruned; cursors older than it need a full resync."""
+    oldest = CatalogueChange.objects.order_by('id').values_list('id', flat=True).first()
+    return (oldest - 1) if oldest else current_version()
+
+
+def prune_changes(older_than):
+    """
+    Delete feed rows older than older_than. Terminals whose cursor falls below
+    what is left get a full resync instead of a delta.
+    """
+    # Always keep the newest row: the catalogue version (and every ETag and
+    # snapshot keyed on it) must never move backwards
+    newest = CatalogueChange.objects.order_by('-id').values_list('id', flat=True).first()
+    deleted, _ = CatalogueChange.objects.filter(changed_at__lt=timezone.now() - older_than).exclude(id=newest).delete()
+    return deleted
+
+
+def changed_ids_since(version):
+    """{model_name: set(object_id)} for every object touched after version."""
+    changed = {name: set() for name in CATALOGUE_MODELS}
+    rows = (
+        CatalogueChange.objects.filter(id__gt=version)
+        .values_list('model_name', 'object_id')
+        .distinct()
+    )
+    for model_name, object_id in rows:
+        if model_name in changed:
+            changed[model_name].add(object_id)
+    return changed
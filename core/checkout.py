@@ -0,0 +1,107 @@
+"""
+Set-based checkout write path.
+
+Every sale costs the same handful of statements regardless of basket size:
+one SELECT for the basket's products, one bulk INSERT for the sale lines and
+one guarded UPDATE (via core.stock) for the stock decrement. The stock UPDATE
+runs last so product rows are locked only for the tail of the transaction.
+"""
+from collections import OrderedDict
+
+from django.db import transaction
+from django.db.models import F
+from rest_framework.exceptions import ValidationError
+
+from .models import Product, BulkDiscount, SaleTransaction, SaleItem, Customer, CustomerTransaction, LoyaltySettings, StockMovement
+from .stock import apply_stock_deltas
+from .rollups import add_sale as add_sale_to_rollup
+
+
+def _requested_quantities(items_data):
+    """Total quantity per product, in pk order. A product may appear on several lines."""
+    totals = {}
+    for item in items_data:
+        totals[item['product_id']] = totals.get(item['product_id'], 0) + item['quantity']
+    return OrderedDict(sorted(totals.items()))
+
+
+def _load_products(product_ids):
+    by_id = (
+        Product.objects.select_related('category')
+        .prefetch_related(BulkDiscount.active_prefetch())
+        .in_bulk(product_ids)
+    )
+    missing = [pid for pid in product_ids if pid not in by_id]
+    if missing:
+        raise ValidationError({'items': f'Invalid product id(s): {", ".join(str(m) for m in missing)}'})
+    return by_id
+
+
+def _sale_item(sale, product, item):
+    # Snapshot cost, name and category so reports never need the live product
+    return SaleItem(
+        transaction=sale,
+        product=product,
+        quantity=item['quantity'],
+        price_at_sale=item['price_at_sale'],
+        cost_at_sale=product.cost_price,
+        product_name=product.name,
+        category_name=product.category.name if product.category else '',
+    )
+
+
+def _award_loyalty(sale, customer):
+    total = float(sale.total_amount)
+    loyalty_settings = LoyaltySettings.objects.filter(is_active=True).first()
+    if loyalty_settings and float(loyalty_settings.points_per_amount) >= 1:
+        points_earned = int(total / float(loyalty_settings.points_per_amount))
+    else:
+        points_earned = int(total / 100)
+
+    # F() expressions update atomically in the database — no race condition
+    Customer.objects.filter(pk=customer.pk).update(
+        loyalty_points=F('loyalty_points') + points_earned,
+        total_spent=F('total_spent') + total,
+        total_visits=F('total_visits') + 1,
+    )
+
+    CustomerTransaction.objects.create(
+        customer=customer,
+        sale=sale,
+        points_earned=points_earned,
+    )
+
+
+@transaction.atomic
+def create_sale(sale_data, items_data, customer=None):
+    """
+    Persist a validated sale and its lines, deducting stock for every line.
+    Raises ValidationError (rolling back the whole sale) if any product is
+    missing, or InsufficientStock listing every line that is short.
+    """
+    requested = _requested_quantities(items_data)
+    products = _load_products(list(requested))
+
+    sale = SaleTransaction.objects.create(**sale_data, customer=customer)
+
+    items = SaleItem.objects.bulk_create([
+        _sale_item(sale, products[item['product_id']], item) for item in items_data
+    ])
+
+    if customer:
+        _award_loyalty(sale, customer)
+
+    add_sale_to_rollup(
+        sale,
+        units=sum(requested.values()),
+        cost=sum(products[pid].cost_price * qty for pid, qty in requested.items()),
+    )
+
+    apply_stock_deltas({pid: -qty for pid, qty in requested.items()}, StockMovement.SALE, sale=sale, user=sale.cashier)
+
+    # Refresh the in-memory rows so the response shows post-sale stock
+    for pid, stock in Product.objects.filter(pk__in=requested).values_list('pk', 'stock'):
+        products[pid].stock = stock
+    sale._prefetched_objects_cache = {'items': items}
+
+    return sale
@@ -0,0 +1,94 @@
+"""
+Live counters for today's sales.
+
+The counters themselves are today's DailySalesRollup rows, which checkout
+bumps with atomic F() updates inside each sale transaction. Their current
+values are kept as one snapshot in the shared cache, keyed by store-local
+date so it rolls over at midnight and stored with the generation token it
+was loaded under. Every committed sale (or deletion) replaces the token, and
+the next reader finds the snapshot's token out of date and rebuilds it from
+the rollup rows, so the polled today endpoints cost one cache read however
+busy the day is. A reader that loaded the rows before a sale committed may
+still write its snapshot last, but under the old token, which no later
+reader accepts.
+"""
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .dates import day_start
+from .models import DailySalesRollup
+
+
+def _generation_key(day):
+    return f'today-counters-gen:{day.isoformat()}'
+
+
+def _expiry(day):
+    # Outlive the day slightly; the keys change at midnight anyway
+    expires = day_start(day + timedelta(days=1)) - timezone.now() + timedelta(hours=1)
+    return int(expires.total_seconds())
+
+
+def _snapshot_key(day):
+    return f'today-counters:{day.isoformat()}'
+
+
+def _load(day):
+    by_cashier = {}
+    rows = (
+        DailySalesRollup.objects.filter(day=day)
+        .values('cashier_id')
+        .annotate(revenue=Sum('revenue'), count=Sum('transaction_count'))
+        .order_by()
+    )
+    for row in rows:
+        by_cashier[row['cashier_id']] = (float(row['revenue'] or 0), row['count'] or 0)
+    return {
+        'store': (sum(r for r, _ in by_cashier.values()), sum(c for _, c in by_cashier.values())),
+        'cashiers': by_cashier,
+    }
+
+
+def today_counters():
+    """{'store': (revenue, count), 'cashiers': {cashier_id: (revenue, count)}} for today."""
+    day = timezone.localdate()
+    cached = cache.get_many([_generation_key(day), _snapshot_key(day)])
+    generation = cached.get(_generation_key(day))
+    if generation is None:
+        # Issued once if it was never set or was lost
+        cache.add(_generation_key(day), time.time_ns(), _expiry(day))
+        generation = cache.get(_generation_key(day))
+    snapshot = cached.get(_snapshot_key(day))
+    if snapshot is not None and snapshot[0] == generation:
+        return snapshot[1]
+    # The generation is read before the rows, so a stale load is stored under a retired one
+    counters = _load(day)
+    cache.set(_snapshot_key(day), (generation, counters), _expiry(day))
+    return counters
+
+
+def invalidate_on_commit(day):
+    """Retire day's snapshot once the current transaction commits."""
+    if day == timezone.localdate():
+        transaction.on_commit(lambda: cache.set(_generation_key(day), time.time_ns(), _expiry(day)))
+
+
+def stats(revenue, count):
+    return {
+        'total_sales': revenue,
+        'transaction_count': count,
+        'average_sale': revenue / count if count else 0,
+    }
+
+
+def store_today():
+    return stats(*today_counters()['store'])
+
+
+def cashier_today(cashier_id):
+    return stats(*today_counters()['cashiers'].get(cashier_id, (0.0, 0)))
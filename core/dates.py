@@ -0,0 +1,40 @@
+"""
+Store-local date ranges as timestamp predicates.
+
+Filtering with created_at__date wraps the column in a cast/timezone
+conversion, so the database cannot use an index on it. These helpers turn
+store-local calendar days into half-open [start, end) timestamp ranges that
+compare the raw column and scan only the rows in range.
+"""
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+
+def parse_day(value):
+    """Date for a YYYY-MM-DD query parameter; None if absent, ValueError if malformed."""
+    if not value:
+        return None
+    day = parse_date(value)
+    if day is None:
+        raise ValueError(f'Invalid date: {value}')
+    return day
+
+
+def day_start(day):
+    """Aware datetime for the first instant of a store-local day."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def date_range_filter(field, start=None, end=None):
+    """
+    Lookups selecting field within store-local days start..end (both
+    inclusive; None leaves that side open), for use as .filter(**lookups).
+    """
+    lookups = {}
+    if start:
+        lookups[f'{field}__gte'] = day_start(start)
+    if end:
+        lookups[f'{field}__lt'] = day_start(end + timedelta(days=1))
+    return lookups
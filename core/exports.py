@@ -0,0 +1,133 @@
+"""
+Streaming sales and catalogue exports.
+
+Exports walk sale lines with one server-side cursor (.iterator()), so memory
+stays flat whether the range is a day or years. CSV rows go straight to the
+client as they are read. XLSX cannot be emitted before the workbook is closed,
+so openpyxl's write-only mode spools it to a temporary file, which is then
+streamed back in blocks. Building a workbook of more than XLSX_SYNC_ROWS
+lines could outlast the gunicorn timeout, so those are built by the run_jobs
+worker instead and stored as ReportFileChunk rows for download.
+"""
+import csv
+import tempfile
+
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+import openpyxl
+
+from .models import Product, ReportFileChunk, SaleItem
+
+EXPORT_HEADERS = [
+    'transaction_id', 'created_at', 'cashier', 'customer',
+    'product_id', 'product_name', 'category', 'quantity',
+    'price_at_sale', 'cost_at_sale', 'line_total',
+    'sale_total', 'paid_amount', 'change_given',
+]
+CHUNK_SIZE = 2000
+# Excel's limit is 1,048,576 rows per sheet; longer exports continue on a new sheet
+XLSX_SHEET_ROWS = 1_000_000
+# Larger XLSX exports are queued for the worker rather than built in the request
+XLSX_SYNC_ROWS = 50_000
+FILE_CHUNK_BYTES = 1024 * 1024
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def sale_line_rows(sales):
+    """One flat row per line of the given sales, oldest sale first."""
+    lines = (
+        SaleItem.objects.filter(transaction__in=sales.values('pk'))
+        .order_by('transaction_id', 'id')
+        .values_list(
+            'transaction_id', 'transaction__created_at',
+            'transaction__cashier__username', 'transaction__customer__name',
+            'product_id', 'product_name', 'category_name', 'quantity',
+            'price_at_sale', 'cost_at_sale',
+            'transaction__total_amount', 'transaction__paid_amount', 'transaction__change_given',
+        )
+    )
+    for (sale_id, created_at, cashier, customer, product_id, name, category,
+         quantity, price, cost, total, paid, change) in lines.iterator(chunk_size=CHUNK_SIZE):
+        yield [
+            sale_id, timezone.localtime(created_at).isoformat(), cashier or '', customer or '',
+            product_id, name, category, quantity,
+            price, cost if cost is not None else '', quantity * price,
+            total, paid, change,
+        ]
+
+
+def product_rows():
+    """One row per product in the upload template's columns, ordered by name."""
+    products = Product.objects.order_by('name', 'pk').values_list(
+        'name', 'category__name', 'price', 'cost_price', 'stock', 'barcode',
+        'unit_of_measure', 'is_bulk_product', 'bulk_quantity', 'bulk_price',
+    )
+    for (name, category, price, cost_price, stock, barcode,
+         unit, is_bulk, bulk_quantity, bulk_price) in products.iterator(chunk_size=CHUNK_SIZE):
+        yield [
+            name, category or '', price, cost_price, stock, barcode,
+            unit, 'TRUE' if is_bulk else 'FALSE', bulk_quantity,
+            bulk_price if bulk_price is not None else '',
+        ]
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to the caller."""
+    def write(self, value):
+        return value
+
+
+def _csv_stream(rows, headers):
+    writer = csv.writer(_Echo())
+    # BOM so Excel reads product names as UTF-8
+    yield '\ufeff' + writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def csv_response(rows, filename, headers=EXPORT_HEADERS):
+    response = StreamingHttpResponse(_csv_stream(rows, headers), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def build_xlsx(rows):
+    """The workbook for rows, spooled to a temporary file and rewound."""
+    wb = openpyxl.Workbook(write_only=True)
+    ws, written = None, XLSX_SHEET_ROWS
+    for row in rows:
+        if written >= XLSX_SHEET_ROWS:
+            ws = wb.create_sheet(title=f'Sales {len(wb.worksheets) + 1}')
+            ws.append(EXPORT_HEADERS)
+            written = 0
+        ws.append(row)
+        written += 1
+    if ws is None:
+        wb.create_sheet(title='Sales 1').append(EXPORT_HEADERS)
+
+    spool = tempfile.TemporaryFile()
+    wb.save(spool)
+    spool.seek(0)
+    return spool
+
+
+def xlsx_response(rows, filename):
+    # FileResponse streams the file in blocks and closes (deletes) it afterwards
+    return FileResponse(build_xlsx(rows), as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+
+
+def store_xlsx(job, rows):
+    """Build the workbook for an export job and save it into the job's chunk rows."""
+    # A retried job starts its file over
+    job.file_chunks.all().delete()
+    with build_xlsx(rows) as spool:
+        for seq, data in enumerate(iter(lambda: spool.read(FILE_CHUNK_BYTES), b'')):
+            ReportFileChunk.objects.create(job=job, seq=seq, data=data)
+
+
+def stored_file_response(job, filename):
+    """Stream an export job's stored file back one chunk row at a time."""
+    chunks = job.file_chunks.order_by('seq').values_list('data', flat=True).iterator(chunk_size=1)
+    response = StreamingHttpResponse((bytes(data) for data in chunks), content_type=XLSX_CONTENT_TYPE)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
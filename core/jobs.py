@@ -0,0 +1,122 @@
+"""
+Background jobs.
+
+A long-range report, a large XLSX export or a large catalogue import holds
+a sync gunicorn worker for as long as it takes, and there are only two of
+them to serve checkouts.
+Such work is submitted as ReportJob or ProductImportJob rows instead and run
+by the run_jobs worker process. Each table is a queue: a worker claims the
+oldest pending job with SELECT ... FOR UPDATE SKIP LOCKED, so more than one
+worker can share it.
+"""
+import logging
+import threading
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .dates import date_range_filter, parse_day
+from .exports import sale_line_rows, store_xlsx
+from .models import ProductImportJob, ReportJob
+from .product_import import run_import
+from .reports import margin_report_data, report_sales, sales_report_data
+
+# Claimed in this order, so quick reports are not stuck behind a long import
+QUEUES = (ReportJob, ProductImportJob)
+# How often a running job's heartbeat is refreshed; keep well under requeue_stale's threshold
+HEARTBEAT_SECONDS = 60
+
+logger = logging.getLogger(__name__)
+
+
+def _compute(job):
+    params = job.params
+    start, end = parse_day(params.get('start_date')), parse_day(params.get('end_date'))
+    if job.kind == ReportJob.MARGIN:
+        return margin_report_data(start, end, params.get('cashier_id'))
+    if job.kind == ReportJob.EXPORT:
+        sales, _ = report_sales(params.get('cashier_id'), params.get('product_id'))
+        store_xlsx(job, sale_line_rows(sales.filter(**date_range_filter('created_at', start, end))))
+        return {'filename': f"sales_{start or 'start'}_{end or timezone.localdate()}.xlsx"}
+    return sales_report_data(start, end, params.get('cashier_id'), params.get('product_id'))
+
+
+def claim_next():
+    """Mark the oldest pending job running and return it, or None if every queue is empty."""
+    for model in QUEUES:
+        with transaction.atomic():
+            job = (
+                model.objects.select_for_update(skip_locked=True)
+                .filter(status=model.PENDING)
+                .order_by('created_at', 'id')
+                .first()
+            )
+            if job is None:
+                continue
+            job.status = model.RUNNING
+            job.started_at = job.heartbeat_at = timezone.now()
+            job.save(update_fields=['status', 'started_at', 'heartbeat_at'])
+        return job
+    return None
+
+
+def _heartbeat(job, stop):
+    """Refresh job's heartbeat every HEARTBEAT_SECONDS until stop is set."""
+    model = type(job)
+    try:
+        while not stop.wait(HEARTBEAT_SECONDS):
+            try:
+                model.objects.filter(pk=job.pk, status=model.RUNNING).update(heartbeat_at=timezone.now())
+            except Exception:
+                logger.warning('Heartbeat for %s failed', job, exc_info=True)
+    finally:
+        # This thread's own database connection
+        connection.close()
+
+
+def run(job):
+    """
+    Run a claimed job and store its outcome. A background thread keeps the
+    job's heartbeat fresh meanwhile, so a long report is not requeued by
+    requeue_stale while it is still being computed.
+    """
+    stop = threading.Event()
+    beat = threading.Thread(target=_heartbeat, args=(job, stop), daemon=True)
+    beat.start()
+    try:
+        if isinstance(job, ProductImportJob):
+            run_import(job)
+        else:
+            job.result = _compute(job)
+        if job.status == job.RUNNING:
+            job.status = job.DONE
+    except Exception as exc:
+        logger.exception('%s failed', job)
+        job.status = job.FAILED
+        job.error = str(exc)[:500]
+    finally:
+        stop.set()
+        beat.join()
+    # An import put back for another attempt is not finished
+    if job.status != job.PENDING:
+        job.finished_at = timezone.now()
+    job.save()
+
+
+def requeue_stale(older_than):
+    """Put back running jobs whose worker has shown no sign of life for older_than."""
+    cutoff = timezone.now() - older_than
+    return sum(
+        # Jobs started before heartbeats were recorded fall back to started_at
+        model.objects.filter(status=model.RUNNING)
+        .filter(Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff))
+        .update(status=model.PENDING, started_at=None, heartbeat_at=None)
+        for model in QUEUES
+    )
+
+
+def prune(older_than):
+    """Delete finished jobs (and their stored results) older than older_than."""
+    cutoff = timezone.now() - older_than
+    return sum(model.objects.filter(finished_at__lt=cutoff).delete()[0] for model in QUEUES)
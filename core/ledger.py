@@ -0,0 +1,85 @@
+"""
+Stock ledger queries.
+
+StockMovement is the full history of Product.stock, so the stock of any
+product at any past instant is the sum of its movements up to then. Summing
+years of sales for that would get slower every day, so snapshot_stock
+periodically records every product's level as a StockSnapshot; stock_at()
+starts from the latest snapshot at or before the requested instant and adds
+only the movements since.
+
+A snapshot at T covers movements created before T. Taking one for an instant
+a few minutes in the past keeps it from missing a movement whose transaction
+started before T but had not committed yet.
+"""
+from django.db import transaction
+from django.db.models import F, IntegerField, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Product, StockMovement, StockSnapshot
+
+
+def _latest_snapshot_time(at):
+    return StockSnapshot.objects.filter(taken_at__lte=at).aggregate(latest=Max('taken_at'))['latest']
+
+
+def stock_at(at, product_ids=None):
+    """{product_id: stock} as of the instant at (movements at exactly at included)."""
+    base = _latest_snapshot_time(at)
+    levels = {}
+    movements = StockMovement.objects.filter(created_at__lte=at)
+    if base:
+        snapshots = StockSnapshot.objects.filter(taken_at=base)
+        if product_ids is not None:
+            snapshots = snapshots.filter(product_id__in=product_ids)
+        levels.update(snapshots.values_list('product_id', 'stock'))
+        movements = movements.filter(created_at__gte=base)
+    if product_ids is not None:
+        movements = movements.filter(product_id__in=product_ids)
+    for pid, total in movements.values('product_id').annotate(total=Sum('quantity')).values_list('product_id', 'total'):
+        levels[pid] = levels.get(pid, 0) + total
+    if product_ids is not None:
+        for pid in product_ids:
+            levels.setdefault(pid, 0)
+    return levels
+
+
+@transaction.atomic
+def take_snapshot(at):
+    """
+    Record every product's stock as of at. Returns (created, count): False
+    and the size of the existing snapshot if one was already taken at at,
+    else True and the number of rows written (0 before any stock moved).
+    """
+    taken = StockSnapshot.objects.filter(taken_at=at).count()
+    if taken:
+        return False, taken
+    base = _latest_snapshot_time(at)
+    levels = {}
+    movements = StockMovement.objects.filter(created_at__lt=at)
+    if base:
+        levels.update(StockSnapshot.objects.filter(taken_at=base).values_list('product_id', 'stock'))
+        movements = movements.filter(created_at__gte=base)
+    for pid, total in movements.values('product_id').annotate(total=Sum('quantity')).values_list('product_id', 'total'):
+        levels[pid] = levels.get(pid, 0) + total
+    # Products deleted since the previous snapshot drop out here
+    existing = set(Product.objects.filter(pk__in=levels).values_list('pk', flat=True))
+    rows = StockSnapshot.objects.bulk_create(
+        [StockSnapshot(product_id=pid, taken_at=at, stock=stock) for pid, stock in levels.items() if pid in existing],
+        batch_size=1000,
+    )
+    return True, len(rows)
+
+
+def discrepancies():
+    """Products whose stock differs from the sum of their ledger, with both figures, in one query."""
+    ledger = (
+        StockMovement.objects.filter(product=OuterRef('pk'))
+        .order_by().values('product').annotate(total=Sum('quantity')).values('total')
+    )
+    return (
+        Product.objects.annotate(ledger=Coalesce(Subquery(ledger, output_field=IntegerField()), Value(0)))
+        .exclude(stock=F('ledger'))
+        .order_by('pk')
+        .values('pk', 'name', 'stock', 'ledger')
+    )
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from core.models import Product, SaleItem
+from core.reports import invalidate_reports
+
+
+class Command(BaseCommand):
+    help = 'Fill cost_at_sale, product_name and category_name on sale lines recorded before they existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Sale lines updated per transaction')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        product = Product.objects.filter(pk=OuterRef('product_id'))
+        pending = SaleItem.objects.filter(cost_at_sale__isnull=True).order_by('pk')
+
+        total, last_pk = 0, 0
+        while True:
+            ids = list(pending.filter(pk__gt=last_pk).values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            # The current product is the best record left of what these lines sold
+            with transaction.atomic():
+                SaleItem.objects.filter(pk__in=ids).update(
+                    cost_at_sale=Subquery(product.values('cost_price')[:1]),
+                    product_name=Subquery(product.values('name')[:1]),
+                    category_name=Coalesce(Subquery(product.values('category__name')[:1]), Value('')),
+                )
+            total += len(ids)
+            last_pk = ids[-1]
+            self.stdout.write(f'  {total} line(s) backfilled...')
+
+        if total:
+            # Cached report days were built from the lines as they were
+            invalidate_reports()
+
+        self.stdout.write(self.style.SUCCESS(f'Backfilled {total} sale line(s).'))
@@ -0,0 +1,16 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from core.catalogue import prune_changes
+
+
+class Command(BaseCommand):
+    help = 'Delete catalogue change-feed rows older than --days (terminals behind that point do a full resync)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30)
+
+    def handle(self, *args, **options):
+        deleted = prune_changes(timedelta(days=options['days']))
+        self.stdout.write(self.style.SUCCESS(f'Pruned {deleted} catalogue change row(s) older than {options["days"]} days.'))
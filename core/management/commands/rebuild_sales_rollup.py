@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.dates import parse_day
+from core.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily sales rollup from raw sales (all history, or --start/--end YYYY-MM-DD)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First store-local day to rebuild')
+        parser.add_argument('--end', help='Last store-local day to rebuild')
+
+    def handle(self, *args, **options):
+        bounds = {}
+        for key in ('start', 'end'):
+            try:
+                bounds[key] = parse_day(options[key])
+            except ValueError:
+                raise CommandError(f'--{key} must be a date in YYYY-MM-DD format')
+        count = rebuild_rollups(**bounds)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} daily rollup row(s).'))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.ledger import discrepancies
+from core.models import StockMovement
+
+
+class Command(BaseCommand):
+    help = 'Check Product.stock against the stock ledger; --fix records the differences as reconciliation movements'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Record a RECONCILE movement for every mismatch')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rows = list(discrepancies())
+            for row in rows:
+                self.stdout.write(f"  #{row['pk']} {row['name']}: stock {row['stock']}, ledger {row['ledger']}")
+            if not rows:
+                self.stdout.write(self.style.SUCCESS('Stock matches the ledger for every product.'))
+                return
+            if not options['fix']:
+                raise CommandError(f'{len(rows)} product(s) differ from the ledger. Run with --fix to record the differences.')
+            # Stock is what the tills sell from, so the ledger is brought in line with it.
+            # Any sale in the meantime moves both sides equally, so the difference holds.
+            StockMovement.objects.bulk_create([
+                StockMovement(product_id=row['pk'], quantity=row['stock'] - row['ledger'], reason=StockMovement.RECONCILE)
+                for row in rows
+            ])
+        self.stdout.write(self.style.SUCCESS(f'Recorded {len(rows)} reconciliation movement(s).'))
@@ -0,0 +1,48 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core import jobs
+from core.catalogue import prune_changes
+
+
+class Command(BaseCommand):
+    help = 'Run queued report and import jobs until stopped (--once: until the queues are empty)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when no job is pending')
+        parser.add_argument('--poll', type=float, default=2.0, help='Seconds to wait between empty queue checks')
+        parser.add_argument('--stale-minutes', type=int, default=30, help='Requeue running jobs with no heartbeat for this long')
+        parser.add_argument('--keep-days', type=int, default=7, help='Delete finished jobs older than this')
+        parser.add_argument('--feed-days', type=int, default=30, help='Delete catalogue change-feed rows older than this')
+
+    def handle(self, *args, **options):
+        stale = timedelta(minutes=options['stale_minutes'])
+        keep = timedelta(days=options['keep_days'])
+        feed = timedelta(days=options['feed_days'])
+        last_requeued = last_pruned = None
+        while True:
+            # A long-lived process must drop connections the database has closed
+            close_old_connections()
+            # Checked while running too: a crashed worker may be restarted (or
+            # replaced by another) long before its job looks stale
+            if last_requeued is None or time.monotonic() - last_requeued > 60:
+                requeued = jobs.requeue_stale(stale)
+                if requeued:
+                    self.stdout.write(f'Requeued {requeued} stale job(s).')
+                last_requeued = time.monotonic()
+            job = jobs.claim_next()
+            if job:
+                jobs.run(job)
+                self.stdout.write(f'{job}')
+                continue
+            if options['once']:
+                break
+            if last_pruned is None or time.monotonic() - last_pruned > 3600:
+                jobs.prune(keep)
+                # Every sale appends feed rows, so the feed is trimmed here too
+                prune_changes(feed)
+                last_pruned = time.monotonic()
+            time.sleep(options['poll'])
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.dates import day_start, parse_day
+from core.ledger import take_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Snapshot every product\'s stock from the ledger as of the start of a store-local day (default: today)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--day', help='Store-local day (YYYY-MM-DD) whose first instant to snapshot')
+
+    def handle(self, *args, **options):
+        try:
+            day = parse_day(options['day']) or timezone.localdate()
+        except ValueError:
+            raise CommandError('--day must be a date in YYYY-MM-DD format')
+        # Midnight is long past when this runs, so no movement before it is still uncommitted
+        at = day_start(day)
+        if at > timezone.now():
+            raise CommandError('Cannot snapshot the future')
+        created, count = take_snapshot(at)
+        if created:
+            self.stdout.write(self.style.SUCCESS(f'Snapshot of {count} product(s) as of {at:%Y-%m-%d %H:%M %Z}.'))
+        else:
+            self.stdout.write(f'A snapshot of {count} product(s) as of {at:%Y-%m-%d %H:%M %Z} already exists.')
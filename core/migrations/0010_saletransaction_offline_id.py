@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 03:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_plan_tier'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='saletransaction',
+            name='offline_id',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 03:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_cataloguechange'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storesettings',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-17 03:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_storesettings_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cataloguechange',
+            name='stock_only',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='cataloguechange',
+            index=models.Index(condition=models.Q(('stock_only', False)), fields=['id'], name='catalogue_pricing_idx'),
+        ),
+    ]
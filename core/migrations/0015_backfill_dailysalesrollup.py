@@ -0,0 +1,53 @@
+from django.db import migrations
+from django.db.models import Count, Sum, F, DecimalField, ExpressionWrapper
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def backfill(apps, schema_editor):
+    SaleTransaction = apps.get_model('core', 'SaleTransaction')
+    SaleItem = apps.get_model('core', 'SaleItem')
+    DailySalesRollup = apps.get_model('core', 'DailySalesRollup')
+    tz = timezone.get_current_timezone()
+
+    rows = {}
+    totals = (
+        SaleTransaction.objects.annotate(day=TruncDate('created_at', tzinfo=tz))
+        .values('day', 'cashier_id')
+        .annotate(count=Count('id'), revenue=Sum('total_amount'))
+        .order_by()
+    )
+    for t in totals:
+        rows[(t['day'], t['cashier_id'])] = DailySalesRollup(
+            day=t['day'], cashier_id=t['cashier_id'],
+            transaction_count=t['count'], revenue=t['revenue'] or 0,
+        )
+
+    line_cost = ExpressionWrapper(
+        F('quantity') * F('product__cost_price'),
+        output_field=DecimalField(max_digits=15, decimal_places=2),
+    )
+    lines = (
+        SaleItem.objects.annotate(day=TruncDate('transaction__created_at', tzinfo=tz))
+        .values('day', 'transaction__cashier_id')
+        .annotate(units=Sum('quantity'), cost=Sum(line_cost))
+        .order_by()
+    )
+    for line in lines:
+        row = rows.get((line['day'], line['transaction__cashier_id']))
+        if row:
+            row.units = line['units'] or 0
+            row.cost = line['cost'] or 0
+
+    DailySalesRollup.objects.bulk_create(rows.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_dailysalesrollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
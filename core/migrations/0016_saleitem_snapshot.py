@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-17 03:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_backfill_dailysalesrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='saleitem',
+            name='category_name',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='saleitem',
+            name='cost_at_sale',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True),
+        ),
+        migrations.AddField(
+            model_name='saleitem',
+            name='product_name',
+            field=models.CharField(blank=True, default='', max_length=200),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-17 03:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_saleitem_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['timestamp'], name='auditlog_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['model_name', 'timestamp'], name='auditlog_model_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='restock',
+            index=models.Index(fields=['restocked_at'], name='restock_restocked_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='saletransaction',
+            index=models.Index(fields=['created_at'], name='sale_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='saletransaction',
+            index=models.Index(fields=['cashier', 'created_at'], name='sale_cashier_created_idx'),
+        ),
+    ]
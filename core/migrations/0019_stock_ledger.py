@@ -0,0 +1,42 @@
+# Generated by Django 5.2 on 2026-10-17 04:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_reportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField()),
+                ('reason', models.CharField(choices=[('OPENING', 'Opening balance'), ('SALE', 'Sale'), ('RESTOCK', 'Restock'), ('UPLOAD', 'Bulk upload'), ('ADJUSTMENT', 'Manual adjustment'), ('RECONCILE', 'Reconciliation')], max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='core.product')),
+                ('sale', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.saletransaction')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_at'], name='stockmove_created_idx'), models.Index(fields=['product', 'created_at'], name='stockmove_product_created_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField()),
+                ('stock', models.IntegerField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='core.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('taken_at', 'product'), name='unique_snapshot_time_product')],
+            },
+        ),
+    ]
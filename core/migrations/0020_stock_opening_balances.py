@@ -0,0 +1,26 @@
+from django.db import migrations
+
+
+def open_ledger(apps, schema_editor):
+    # Stock on hand before the ledger existed becomes each product's opening
+    # balance, so the ledger sums to Product.stock from the start
+    Product = apps.get_model('core', 'Product')
+    StockMovement = apps.get_model('core', 'StockMovement')
+    StockMovement.objects.bulk_create(
+        (
+            StockMovement(product_id=pk, quantity=stock, reason='OPENING')
+            for pk, stock in Product.objects.exclude(stock=0).values_list('pk', 'stock').iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.RunPython(open_ledger, migrations.RunPython.noop),
+    ]
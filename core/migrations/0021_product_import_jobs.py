@@ -0,0 +1,64 @@
+# Generated by Django 5.2 on 2026-10-17 04:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_stock_opening_balances'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filename', models.CharField(max_length=255)),
+                ('atomic', models.BooleanField(default=False)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='PENDING', max_length=10)),
+                ('rows_read', models.PositiveIntegerField(default=0)),
+                ('created', models.PositiveIntegerField(default=0)),
+                ('updated', models.PositiveIntegerField(default=0)),
+                ('error_count', models.PositiveIntegerField(default=0)),
+                ('errors', models.JSONField(blank=True, default=list)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProductImportChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.PositiveIntegerField()),
+                ('data', models.BinaryField()),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='core.productimportjob')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProductImportRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row_num', models.PositiveIntegerField()),
+                ('data', models.JSONField()),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='staged_rows', to='core.productimportjob')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='productimportjob',
+            index=models.Index(condition=models.Q(('status', 'PENDING')), fields=['created_at'], name='importjob_pending_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='productimportchunk',
+            constraint=models.UniqueConstraint(fields=('job', 'seq'), name='unique_import_chunk_seq'),
+        ),
+        migrations.AddConstraint(
+            model_name='productimportrow',
+            constraint=models.UniqueConstraint(fields=('job', 'row_num'), name='unique_import_row_num'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 04:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_product_import_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productimportjob',
+            name='unchanged',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-17 04:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_product_import_unchanged'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productimportjob',
+            name='dry_run',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='productimportjob',
+            name='preview',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
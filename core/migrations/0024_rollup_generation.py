@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 04:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_product_import_dry_run'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailysalesrollup',
+            name='generation',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+BATCH_SIZE = 5000
+
+
+def backfill(apps, schema_editor):
+    Product = apps.get_model('core', 'Product')
+    SaleItem = apps.get_model('core', 'SaleItem')
+    product = Product.objects.filter(pk=OuterRef('product_id'))
+    pending = SaleItem.objects.filter(cost_at_sale__isnull=True).order_by('pk')
+
+    # The current product is the best record left of what these lines sold
+    last_pk = 0
+    while True:
+        ids = list(pending.filter(pk__gt=last_pk).values_list('pk', flat=True)[:BATCH_SIZE])
+        if not ids:
+            break
+        SaleItem.objects.filter(pk__in=ids).update(
+            cost_at_sale=Subquery(product.values('cost_price')[:1]),
+            product_name=Subquery(product.values('name')[:1]),
+            category_name=Coalesce(Subquery(product.values('category__name')[:1]), Value('')),
+        )
+        last_pk = ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0026_product_import_attempts'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-17 04:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_backfill_sale_item_snapshots'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reportjob',
+            name='kind',
+            field=models.CharField(choices=[('sales', 'Sales summary'), ('margin', 'Margin'), ('export', 'Sales export (XLSX)')], max_length=10),
+        ),
+        migrations.CreateModel(
+            name='ReportFileChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.PositiveIntegerField()),
+                ('data', models.BinaryField()),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='file_chunks', to='core.reportjob')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('job', 'seq'), name='unique_report_file_chunk_seq')],
+            },
+        ),
+    ]
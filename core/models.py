@@ -1,4 +1,7 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models import Prefetch, Q
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
 
 class Category(models.Model):
@@ -49,19 +52,56 @@ class SaleTransaction(models.Model):
     paid_amount = models.DecimalField(max_digits=15, decimal_places=2)
     change_given = models.DecimalField(max_digits=15, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Client-generated id for sales queued offline — makes re-syncing idempotent
+    offline_id = models.CharField(max_length=64, unique=True, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='sale_created_idx'),
+            models.Index(fields=['cashier', 'created_at'], name='sale_cashier_created_idx'),
+        ]
 
     def __str__(self):
         return f"Sale #{self.id} - {self.created_at}"
 
 
+class DailySalesRollup(models.Model):
+    """
+    Sales totals per store-local day and cashier, kept current by checkout.
+    Daily summaries read these rows instead of scanning every sale.
+    """
+    day = models.DateField()
+    cashier = models.ForeignKey('Staff', on_delete=models.SET_NULL, null=True, blank=True)
+    transaction_count = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    cost = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    units = models.PositiveIntegerField(default=0)
+    # Bumped by every sale added or removed; cached report spans are keyed on its sum
+    generation = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'cashier'], name='unique_rollup_day_cashier'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.cashier_id or '-'}: {self.transaction_count} sales"
+
+
 class SaleItem(models.Model):
     transaction = models.ForeignKey(SaleTransaction, related_name='items', on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.PROTECT, null=False)
     quantity = models.PositiveIntegerField()
     price_at_sale = models.DecimalField(max_digits=10, decimal_places=2)
+    # Snapshot of the product at sale time, so reports neither join Product
+    # nor pick up later cost or name changes. Null cost = not yet backfilled
+    # (reports fall back to the product's current cost).
+    cost_at_sale = models.DecimalField(max_digits=15, decimal_places=2, null=True, blank=True)
+    product_name = models.CharField(max_length=200, blank=True, default='')
+    category_name = models.CharField(max_length=100, blank=True, default='')
 
     def __str__(self):
-        return f"{self.product.name} x {self.quantity}"
+        return f"{self.product_name or self.product.name} x {self.quantity}"
 
 class Staff(AbstractUser):
     is_cashier = models.BooleanField(default=False)
@@ -88,10 +128,70 @@ class Restock(models.Model):
     restocked_by = models.ForeignKey(Staff, on_delete=models.SET_NULL, null=True)
     restocked_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['restocked_at'], name='restock_restocked_idx'),
+        ]
+
     def __str__(self):
         return f"{self.product.name} +{self.quantity_added} on {self.restocked_at}"
     
 
+class StockMovement(models.Model):
+    """
+    Append-only ledger of every change to Product.stock, written in the same
+    transaction as the change itself. A product's stock is the sum of its
+    movements; StockSnapshot rows let stock_at() start part-way through.
+    """
+    OPENING = 'OPENING'
+    SALE = 'SALE'
+    RESTOCK = 'RESTOCK'
+    UPLOAD = 'UPLOAD'
+    ADJUSTMENT = 'ADJUSTMENT'
+    RECONCILE = 'RECONCILE'
+    REASON_CHOICES = [
+        (OPENING, 'Opening balance'),
+        (SALE, 'Sale'),
+        (RESTOCK, 'Restock'),
+        (UPLOAD, 'Bulk upload'),
+        (ADJUSTMENT, 'Manual adjustment'),
+        (RECONCILE, 'Reconciliation'),
+    ]
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_movements')
+    quantity = models.IntegerField()
+    reason = models.CharField(max_length=10, choices=REASON_CHOICES)
+    sale = models.ForeignKey(SaleTransaction, on_delete=models.SET_NULL, null=True, blank=True)
+    created_by = models.ForeignKey(Staff, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='stockmove_created_idx'),
+            models.Index(fields=['product', 'created_at'], name='stockmove_product_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} {self.quantity:+} ({self.reason})"
+
+
+class StockSnapshot(models.Model):
+    """
+    A product's stock as of taken_at: the sum of its movements created before
+    that instant. Snapshots are taken for every product at once.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_snapshots')
+    taken_at = models.DateTimeField()
+    stock = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['taken_at', 'product'], name='unique_snapshot_time_product'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} = {self.stock} at {self.taken_at}"
+
+
 class Customer(models.Model):
     phone = models.CharField(max_length=15, unique=True)
     name = models.CharField(max_length=100)
@@ -144,6 +244,19 @@ class BulkDiscount(models.Model):
     
     def __str__(self):
         return f"{self.name} - {self.product.name}"
+
+    @classmethod
+    def active_prefetch(cls, lookup='bulk_discounts'):
+        """
+        Prefetch the discounts running right now onto product.active_bulk_discounts.
+        Pass a longer lookup (e.g. 'items__product__bulk_discounts') to reach
+        products through a relation.
+        """
+        now = timezone.now()
+        running = cls.objects.filter(is_active=True, start_date__lte=now).filter(
+            Q(end_date__isnull=True) | Q(end_date__gte=now)
+        )
+        return Prefetch(lookup, queryset=running, to_attr='active_bulk_discounts')
     
     def calculate_discount(self, quantity, unit_price):
         """Calculate discount amount based on type"""
@@ -161,6 +274,28 @@ class BulkDiscount(models.Model):
         return 0
 
 
+class CatalogueChange(models.Model):
+    """
+    Append-only change feed for the POS catalogue. The row id doubles as the
+    catalogue version: a terminal that has seen version N only needs the
+    objects named by rows with id > N.
+    """
+    model_name = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    changed_at = models.DateTimeField(auto_now_add=True)
+    # True for rows written by stock movements alone (sales, restocks), which
+    # leave names, prices and discounts untouched
+    stock_only = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], condition=Q(stock_only=False), name='catalogue_pricing_idx'),
+        ]
+
+    def __str__(self):
+        return f"v{self.id} {self.model_name} #{self.object_id}"
+
+
 class AuditLog(models.Model):
     ACTION_CHOICES = [
         ('CREATE', 'Create'),
@@ -177,11 +312,133 @@ class AuditLog(models.Model):
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['timestamp'], name='auditlog_timestamp_idx'),
+            models.Index(fields=['model_name', 'timestamp'], name='auditlog_model_timestamp_idx'),
+        ]
 
     def __str__(self):
         return f"{self.action} {self.model_name} #{self.object_id} by {self.changed_by}"
 
 
+class ReportJob(models.Model):
+    """
+    A report computed off the request path by the run_jobs worker. The table
+    doubles as the queue: workers claim pending rows oldest first.
+    """
+    SALES = 'sales'
+    MARGIN = 'margin'
+    EXPORT = 'export'
+    KIND_CHOICES = [
+        (SALES, 'Sales summary'),
+        (MARGIN, 'Margin'),
+        (EXPORT, 'Sales export (XLSX)'),
+    ]
+    PENDING = 'PENDING'
+    RUNNING = 'RUNNING'
+    DONE = 'DONE'
+    FAILED = 'FAILED'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True, default='')
+    requested_by = models.ForeignKey('Staff', on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Last sign of life from the worker running the job; stale ones are requeued
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], condition=Q(status='PENDING'), name='reportjob_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} report #{self.id} ({self.status})"
+
+
+class ReportFileChunk(models.Model):
+    """A piece of the file an export job built, stored in order for download."""
+    job = models.ForeignKey(ReportJob, on_delete=models.CASCADE, related_name='file_chunks')
+    seq = models.PositiveIntegerField()
+    data = models.BinaryField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['job', 'seq'], name='unique_report_file_chunk_seq'),
+        ]
+
+
+class ProductImportJob(models.Model):
+    """
+    A catalogue upload imported by the run_jobs worker in fixed-size chunks.
+    The web and worker processes share only the database, so the file itself
+    is stored as ProductImportChunk rows. With atomic set, valid rows are
+    staged as ProductImportRow and applied in one transaction, and only if
+    every row in the file validated. A dry_run job writes nothing but its
+    preview, and keeps the file so it can then be committed as an import.
+    """
+    PENDING, RUNNING, DONE, FAILED = ReportJob.PENDING, ReportJob.RUNNING, ReportJob.DONE, ReportJob.FAILED
+    filename = models.CharField(max_length=255)
+    atomic = models.BooleanField(default=False)
+    dry_run = models.BooleanField(default=False)
+    status = models.CharField(max_length=10, choices=ReportJob.STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    rows_read = models.PositiveIntegerField(default=0)
+    created = models.PositiveIntegerField(default=0)
+    updated = models.PositiveIntegerField(default=0)
+    unchanged = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)  # the first few row errors
+    preview = models.JSONField(default=dict, blank=True)  # dry runs: the first few new products and diffs
+    error = models.TextField(blank=True, default='')
+    requested_by = models.ForeignKey('Staff', on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Last sign of life from the worker running the job; stale ones are requeued
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], condition=Q(status='PENDING'), name='importjob_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"import {self.filename} #{self.id} ({self.status})"
+
+
+class ProductImportChunk(models.Model):
+    job = models.ForeignKey(ProductImportJob, on_delete=models.CASCADE, related_name='chunks')
+    seq = models.PositiveIntegerField()
+    data = models.BinaryField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['job', 'seq'], name='unique_import_chunk_seq'),
+        ]
+
+
+class ProductImportRow(models.Model):
+    """A validated row staged for an all-or-nothing import."""
+    job = models.ForeignKey(ProductImportJob, on_delete=models.CASCADE, related_name='staged_rows')
+    row_num = models.PositiveIntegerField()
+    data = models.JSONField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['job', 'row_num'], name='unique_import_row_num'),
+        ]
+
+
 class StoreSettings(models.Model):
     TIER_CHOICES = [
         ('STARTER',  'Starter'),
@@ -197,6 +454,8 @@ class StoreSettings(models.Model):
     receipt_footer  = models.CharField(max_length=200, blank=True, default='Thank you for your business!')
     # Subscription plan — set this once per client deployment
     plan_tier       = models.CharField(max_length=10, choices=TIER_CHOICES, default='BUSINESS')
+    # Bumped on every save (API or admin) — drives the settings ETag
+    version         = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         verbose_name_plural = 'Store Settings'
@@ -204,6 +463,13 @@ class StoreSettings(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.version += 1
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'version'}
+        super().save(*args, **kwargs)
+
     @classmethod
     def load(cls):
         """Always returns the single settings record, creating it if needed."""
@@ -0,0 +1,474 @@
+"""
+Product bulk import.
+
+Sheets are read lazily, one row at a time, by read_xlsx or read_csv (plain
+CSV skips openpyxl's XML parsing entirely) and checked by validate_row. Validated rows are written set-based: existing products and categories are
+preloaded into dicts keyed by barcode and name, missing categories are created
+in one INSERT, and products go through one bulk_create and one bulk_update,
+so an upload costs a handful of queries however many rows it has. Stock on
+existing products still moves by delta through core.stock, so the change is
+recorded in the stock ledger. Rows that would leave a product as it is are
+skipped, so re-uploading a mostly unchanged catalogue writes (and audits)
+only what changed; preview_import reports the same comparison without writing.
+
+Uploads too large to import within a request run as a ProductImportJob:
+run_import reads the stored file in CHUNK_ROWS batches, committing each one
+(or, for an atomic job, staging it), so memory and lock time stay bounded
+however many rows the file has.
+"""
+import csv
+import io
+import logging
+import tempfile
+from decimal import Decimal
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+import openpyxl
+
+from .catalogue import record_changes
+from .models import AuditLog, Category, Product, ProductImportChunk, ProductImportJob, ProductImportRow, StockMovement
+from .stock import apply_stock_deltas, record_initial_stock
+
+REQUIRED_COLUMNS = {'name', 'price', 'cost_price', 'stock', 'barcode'}
+CHUNK_ROWS = 500
+FILE_CHUNK_BYTES = 1024 * 1024
+MAX_REPORTED_ERRORS = 200
+MAX_PREVIEW_ITEMS = 1000
+MAX_IMPORT_ATTEMPTS = 3
+
+# Everything an upload sets on an existing product apart from stock
+PRODUCT_FIELDS = [
+    'name', 'category', 'price', 'cost_price', 'unit_of_measure',
+    'is_bulk_product', 'bulk_quantity', 'bulk_price',
+]
+BATCH_SIZE = 500
+
+logger = logging.getLogger(__name__)
+
+
+class SheetError(ValueError):
+    """The file as a whole cannot be imported (unreadable, or missing columns)."""
+
+
+def _records(rows):
+    """Check the header row of rows, then yield (row number, {column: value}) for rows with a name."""
+    header = [str(h).strip().lower() if h else '' for h in next(rows, ())]
+    if not REQUIRED_COLUMNS.issubset(header):
+        raise SheetError(
+            f'Missing required columns. Expected: {", ".join(REQUIRED_COLUMNS)}. Got: {", ".join(h for h in header if h)}'
+        )
+    # The first column with a given name wins
+    columns = {name: i for i, name in reversed(list(enumerate(header))) if name}
+    # Any row where name is blank is silently ignored
+    for row_num, row in enumerate(rows, start=2):
+        values = {name: row[i] if i < len(row) else None for name, i in columns.items()}
+        if str(values['name'] or '').strip():
+            yield row_num, values
+
+
+def read_xlsx(fileobj):
+    """
+    Yield (row number, {column: value}) for every row with a name, reading
+    the sheet lazily. Raises SheetError for an unreadable file or missing
+    required columns.
+    """
+    try:
+        wb = openpyxl.load_workbook(fileobj, data_only=True, read_only=True)
+    except Exception:
+        raise SheetError('Could not read Excel file. Make sure it is a valid .xlsx file.')
+    try:
+        yield from _records(wb.active.iter_rows(values_only=True))
+    finally:
+        wb.close()
+
+
+def read_csv(fileobj):
+    """
+    read_xlsx for a UTF-8 CSV file (Excel's BOM allowed), decoded as it is
+    read. Values are strings, blank cells empty strings.
+    """
+    # Uploaded files wrap the real file object, which TextIOWrapper needs
+    raw = getattr(fileobj, 'file', fileobj)
+    raw.seek(0)
+    text = io.TextIOWrapper(raw, encoding='utf-8-sig', newline='')
+    try:
+        yield from _records(csv.reader(text))
+    except (UnicodeDecodeError, csv.Error):
+        raise SheetError('Could not read CSV file. Make sure it is saved as UTF-8 CSV.')
+    finally:
+        # Leave the underlying file open for its owner
+        text.detach()
+
+
+def reader_for(filename):
+    """The row reader for an uploaded file, chosen by its extension."""
+    return read_csv if filename.lower().endswith('.csv') else read_xlsx
+
+
+def validate_row(row_num, values):
+    """(row, None) for a valid sheet row, or (None, error) describing why it is not."""
+    name = str(values.get('name') or '').strip()
+
+    def fail(message):
+        return None, {'row': row_num, 'name': name, 'error': message}
+
+    try:
+        price = float(values.get('price') or 0)
+        cost_price = float(values.get('cost_price') or 0)
+        stock = int(float(values.get('stock') or 0))
+        barcode = str(values.get('barcode') or '').strip()
+        category_name = str(values.get('category_name') or '').strip()
+        unit_of_measure = str(values.get('unit_of_measure') or 'units').strip()
+        is_bulk_raw = str(values.get('is_bulk_product') or 'false').strip().lower()
+        is_bulk = is_bulk_raw in ('true', '1', 'yes')
+        bulk_quantity = int(float(values.get('bulk_quantity') or 1))
+        bulk_price_raw = values.get('bulk_price')
+        bulk_price = float(bulk_price_raw) if bulk_price_raw not in (None, '', 'none') else None
+    except Exception as e:
+        return fail(str(e))
+
+    if price <= 0:
+        return fail('Price must be positive')
+    if cost_price < 0:
+        return fail('Cost price cannot be negative')
+    if stock < 0:
+        return fail('Stock cannot be negative')
+    if not barcode:
+        return fail('Barcode is required')
+
+    return {
+        'row_num': row_num, 'name': name, 'barcode': barcode,
+        'category_name': category_name, 'price': price, 'cost_price': cost_price,
+        'stock': stock, 'unit_of_measure': unit_of_measure,
+        'is_bulk': is_bulk, 'bulk_quantity': bulk_quantity, 'bulk_price': bulk_price,
+    }, None
+
+
+def _categories(names):
+    """{name: Category} for every name, creating the missing ones in one INSERT."""
+    names = {name for name in names if name}
+    found = {c.name: c for c in Category.objects.filter(name__in=names)}
+    missing = names - set(found)
+    if missing:
+        # ignore_conflicts covers a category created by someone else meanwhile,
+        # but returns no ids, so the new rows are read back
+        Category.objects.bulk_create([Category(name=name) for name in sorted(missing)], ignore_conflicts=True)
+        found.update((c.name, c) for c in Category.objects.filter(name__in=missing))
+    return found
+
+
+def _fields(row, categories):
+    return {
+        'name': row['name'],
+        'category': categories.get(row['category_name']),
+        'price': row['price'],
+        'cost_price': row['cost_price'],
+        'unit_of_measure': row['unit_of_measure'],
+        'is_bulk_product': row['is_bulk'],
+        'bulk_quantity': row['bulk_quantity'] if row['is_bulk'] else 1,
+        'bulk_price': row['bulk_price'] if row['is_bulk'] else None,
+    }
+
+
+def _money(value):
+    return None if value is None else Decimal(str(value)).quantize(Decimal('0.01'))
+
+
+def _sheet_values(row):
+    """What a validated row would set, in the same form as _product_values."""
+    return {
+        'name': row['name'],
+        'category': row['category_name'],
+        'price': _money(row['price']),
+        'cost_price': _money(row['cost_price']),
+        'stock': row['stock'],
+        'unit_of_measure': row['unit_of_measure'],
+        'is_bulk_product': row['is_bulk'],
+        'bulk_quantity': row['bulk_quantity'] if row['is_bulk'] else 1,
+        'bulk_price': _money(row['bulk_price']) if row['is_bulk'] else None,
+    }
+
+
+def _product_values(product):
+    return {
+        'name': product.name,
+        'category': product.category.name if product.category else '',
+        'price': _money(product.price),
+        'cost_price': _money(product.cost_price),
+        'stock': product.stock,
+        'unit_of_measure': product.unit_of_measure,
+        'is_bulk_product': product.is_bulk_product,
+        'bulk_quantity': product.bulk_quantity,
+        'bulk_price': _money(product.bulk_price),
+    }
+
+
+def _compare(rows):
+    """
+    Match validated rows to products by barcode (a barcode repeated in the
+    sheet takes its last row) in one query. Returns (rows, existing, changes)
+    where existing maps barcode to Product and changes maps barcode to
+    {field: (old, new)} for each existing product the sheet would change.
+    """
+    rows = list({row['barcode']: row for row in rows}.values())
+    existing = Product.objects.select_related('category').in_bulk(
+        [row['barcode'] for row in rows], field_name='barcode'
+    )
+    changes = {}
+    for row in rows:
+        product = existing.get(row['barcode'])
+        if product is None:
+            continue
+        old, new = _product_values(product), _sheet_values(row)
+        diff = {field: (old[field], new[field]) for field in new if old[field] != new[field]}
+        if diff:
+            changes[row['barcode']] = diff
+    return rows, existing, changes
+
+
+def _plain(value):
+    return str(value) if isinstance(value, Decimal) else value
+
+
+def preview_import(rows):
+    """
+    What import_products would do with validated rows, without writing:
+    counts, the barcodes it would create, and a per-field diff for every
+    product it would update.
+    """
+    rows, existing, changes = _compare(rows)
+    created = [
+        {'row': row['row_num'], 'barcode': row['barcode'], 'name': row['name']}
+        for row in rows if row['barcode'] not in existing
+    ]
+    updated = [
+        {
+            'row': row['row_num'],
+            'barcode': row['barcode'],
+            'name': existing[row['barcode']].name,
+            'changes': {
+                # Money as strings, as the product API returns it
+                field: {'old': _plain(old), 'new': _plain(new)}
+                for field, (old, new) in changes[row['barcode']].items()
+            },
+        }
+        for row in rows if row['barcode'] in changes
+    ]
+    return {
+        'created': len(created),
+        'updated': len(updated),
+        'unchanged': len(existing) - len(updated),
+        'new_products': created,
+        'changes': updated,
+    }
+
+
+@transaction.atomic
+def import_products(rows, user):
+    """
+    Create or update one product per validated row, matched on barcode (a
+    barcode repeated in the sheet takes its last row). Rows matching their
+    product exactly are skipped. Returns (created, updated, unchanged).
+    """
+    rows, existing, changes = _compare(rows)
+    categories = _categories(row['category_name'] for row in rows if row['barcode'] not in existing or row['barcode'] in changes)
+
+    new, changed, stock_deltas = [], [], {}
+    for row in rows:
+        product = existing.get(row['barcode'])
+        if product is None:
+            new.append(Product(barcode=row['barcode'], stock=row['stock'], **_fields(row, categories)))
+            continue
+        diff = changes.get(row['barcode'])
+        if not diff:
+            continue
+        if 'stock' in diff:
+            stock_deltas[product.pk] = row['stock'] - product.stock
+        if diff.keys() - {'stock'}:
+            for attr, value in _fields(row, categories).items():
+                setattr(product, attr, value)
+            changed.append(product)
+
+    Product.objects.bulk_create(new, batch_size=BATCH_SIZE)
+    Product.objects.bulk_update(changed, PRODUCT_FIELDS, batch_size=BATCH_SIZE)
+    record_initial_stock(new, StockMovement.UPLOAD, user=user)
+    apply_stock_deltas(stock_deltas, StockMovement.UPLOAD, user=user)
+
+    AuditLog.objects.bulk_create([
+        AuditLog(
+            action='CREATE',
+            model_name='Product',
+            object_id=str(product.pk),
+            object_repr=str(product)[:200],
+            changed_by=user,
+            changes={'source': 'bulk_upload'},
+        )
+        for product in new
+    ] + [
+        AuditLog(
+            action='UPDATE',
+            model_name='Product',
+            object_id=str(existing[barcode].pk),
+            object_repr=str(existing[barcode])[:200],
+            changed_by=user,
+            changes={'source': 'bulk_upload', 'fields': sorted(diff)},
+        )
+        for barcode, diff in changes.items()
+    ], batch_size=BATCH_SIZE)
+    # Stock-only changes are already recorded by apply_stock_deltas
+    record_changes('Product', [product.pk for product in new + changed])
+    record_changes('Category', [product.category_id for product in new + changed if product.category_id])
+    return len(new), len(changes), len(existing) - len(changes)
+
+
+# ─── Background imports ──────────────────────────────────────────────────────
+
+def store_upload(job, upload):
+    """Save an uploaded file into the job's chunk rows, one chunk in memory at a time."""
+    for seq, data in enumerate(upload.chunks(FILE_CHUNK_BYTES)):
+        ProductImportChunk.objects.create(job=job, seq=seq, data=data)
+
+
+def _spool(job):
+    """The job's file reassembled in a temporary file, for readers that need to seek."""
+    spool = tempfile.TemporaryFile()
+    for data in job.chunks.order_by('seq').values_list('data', flat=True).iterator(chunk_size=1):
+        spool.write(data)
+    spool.seek(0)
+    return spool
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _preview_chunk(job, rows, previewed):
+    """
+    Fold one chunk's preview into the job's. The import applies a barcode's
+    rows in turn, so its last row decides what happens to the product: a
+    barcode already previewed from an earlier chunk has that outcome taken
+    back first. previewed maps barcode to 'created', 'updated' or 'unchanged'.
+    """
+    preview = preview_import(rows)
+    outcomes = dict.fromkeys((row['barcode'] for row in rows), 'unchanged')
+    outcomes.update((item['barcode'], 'created') for item in preview['new_products'])
+    outcomes.update((item['barcode'], 'updated') for item in preview['changes'])
+
+    repeated = outcomes.keys() & previewed.keys()
+    for barcode in repeated:
+        setattr(job, previewed[barcode], getattr(job, previewed[barcode]) - 1)
+    if repeated:
+        for key in ('new_products', 'changes'):
+            job.preview[key] = [item for item in job.preview[key] if item['barcode'] not in repeated]
+
+    for outcome in outcomes.values():
+        setattr(job, outcome, getattr(job, outcome) + 1)
+    previewed.update(outcomes)
+    for key in ('new_products', 'changes'):
+        job.preview[key].extend(preview[key][:MAX_PREVIEW_ITEMS - len(job.preview[key])])
+
+
+def _import_file(job):
+    """Read, validate and apply (or stage, or preview) the job's file, updating its counts."""
+    previewed = {}
+    with _spool(job) as spool:
+        for batch in _batches(reader_for(job.filename)(spool), CHUNK_ROWS):
+            valid = []
+            for row_num, values in batch:
+                row, error = validate_row(row_num, values)
+                if row:
+                    valid.append(row)
+                    continue
+                job.error_count += 1
+                if len(job.errors) < MAX_REPORTED_ERRORS:
+                    job.errors.append(error)
+            if job.dry_run:
+                _preview_chunk(job, valid, previewed)
+            elif job.atomic:
+                ProductImportRow.objects.bulk_create(
+                    [ProductImportRow(job=job, row_num=row['row_num'], data=row) for row in valid]
+                )
+            elif valid:
+                created, updated, unchanged = import_products(valid, job.requested_by)
+                job.created += created
+                job.updated += updated
+                job.unchanged += unchanged
+            job.rows_read += len(batch)
+            job.heartbeat_at = timezone.now()
+            job.save(update_fields=['rows_read', 'created', 'updated', 'unchanged', 'error_count', 'errors', 'heartbeat_at'])
+
+    if job.dry_run or not job.atomic:
+        return
+    if job.error_count:
+        job.status = job.FAILED
+        job.error = f'{job.error_count} row(s) failed validation. No products were saved.'
+        return
+    staged = job.staged_rows.order_by('row_num').values_list('data', flat=True)
+    with transaction.atomic():
+        for batch in _batches(staged.iterator(chunk_size=CHUNK_ROWS), CHUNK_ROWS):
+            created, updated, unchanged = import_products(batch, job.requested_by)
+            job.created += created
+            job.updated += updated
+            job.unchanged += unchanged
+
+
+def run_import(job):
+    """
+    Import a claimed ProductImportJob chunk by chunk, recording progress on
+    the job after each one. Leaves status FAILED (with nothing written) when
+    an atomic job has invalid rows, and PENDING, with the file kept, after an
+    unexpected error while attempts remain; the caller marks every other
+    outcome. A dry run fills in the counts and job.preview instead of
+    writing, and keeps the file for commit_preview.
+    """
+    if not job.chunks.exists():
+        job.status = job.FAILED
+        job.error = 'The uploaded file is no longer available. Please upload it again.'
+        return
+    # A retried or requeued job starts over; rows it already imported come back unchanged
+    job.attempts += 1
+    job.rows_read = job.created = job.updated = job.unchanged = job.error_count = 0
+    job.errors = []
+    job.error = ''
+    job.preview = {'new_products': [], 'changes': []} if job.dry_run else {}
+    job.staged_rows.all().delete()
+    try:
+        _import_file(job)
+    except SheetError:
+        # The file itself is unusable; no retry can help
+        job.chunks.all().delete()
+        raise
+    except Exception as exc:
+        if job.attempts >= MAX_IMPORT_ATTEMPTS:
+            job.chunks.all().delete()
+            raise
+        # Possibly transient (a lost connection, a lock timeout): keep the file and try again
+        logger.warning('%s failed on attempt %s, will retry', job, job.attempts, exc_info=True)
+        job.status = job.PENDING
+        job.started_at = job.heartbeat_at = None
+        job.error = str(exc)[:500]
+    else:
+        # The file is only needed while the job runs, except that a previewed
+        # file is kept until it is committed or pruned
+        if not job.dry_run or job.status == job.FAILED:
+            job.chunks.all().delete()
+    finally:
+        job.staged_rows.all().delete()
+
+
+def commit_preview(job):
+    """
+    Queue a finished, error-free dry run as an all-or-nothing import of the
+    same file. Returns False if the job is not such a preview (or another
+    request committed it first).
+    """
+    return bool(ProductImportJob.objects.filter(
+        pk=job.pk, dry_run=True, status=ProductImportJob.DONE, error_count=0,
+    ).update(
+        dry_run=False, atomic=True, status=ProductImportJob.PENDING,
+        started_at=None, heartbeat_at=None, finished_at=None, attempts=0,
+    ))
@@ -0,0 +1,431 @@
+"""
+Sales report aggregates.
+
+Reports are computed as grouped SQL aggregates over SaleItem, so the cost of
+a report depends on the number of products/days/categories it returns rather
+than on the number of lines sold in the range. Lines carry their own cost,
+product name and category name from the time of sale, so the aggregates read
+SaleItem alone and never join Category (Product only for the cost of lines
+that predate cost_at_sale).
+
+Totals, the daily summary and the cashier breakdown come from
+DailySalesRollup unless a product filter needs raw sales. The line
+breakdowns (products, categories, hours, per-day margins) of the closed
+days in the range are cached in segments: one per calendar month wholly
+inside the range and one per loose day at either end, summed at read time.
+A segment's key includes the sum of its own days' rollup generations, which
+every sale added to or removed from those days increases, so a late sale
+only retires the segment it falls in and segments never need a timeout.
+Writes that change lines without going through the rollup call
+invalidate_reports(), which replaces a global epoch. Today is always
+recomputed and merged in, so a rolling range that moves on by a day reuses
+every segment but the new one.
+"""
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum, F, DecimalField, ExpressionWrapper, Exists, OuterRef
+from django.db.models.functions import Coalesce, ExtractHour, TruncDate
+from django.utils import timezone
+
+from .dates import date_range_filter
+from .models import DailySalesRollup, SaleItem, SaleTransaction, Staff
+
+TOP_PRODUCTS = 15
+REPORT_EPOCH_KEY = 'report-epoch'
+
+
+def line_revenue():
+    return ExpressionWrapper(
+        F('quantity') * F('price_at_sale'),
+        output_field=DecimalField(max_digits=15, decimal_places=2),
+    )
+
+
+def line_cost():
+    # Lines sold before cost_at_sale existed fall back to the product's current cost
+    return ExpressionWrapper(
+        F('quantity') * Coalesce('cost_at_sale', 'product__cost_price'),
+        output_field=DecimalField(max_digits=15, decimal_places=2),
+    )
+
+
+# ─── Cached line breakdowns ─────────────────────────────────────────────────
+
+def invalidate_reports():
+    """
+    Forget every cached report span once the current transaction commits.
+    Call from writes that change sale lines without going through the rollup.
+    """
+    token = time.time_ns()
+    transaction.on_commit(lambda: cache.set(REPORT_EPOCH_KEY, token, None))
+
+
+def _epoch():
+    """The current global epoch. A lost one is re-issued, never reset."""
+    epoch = cache.get(REPORT_EPOCH_KEY)
+    if epoch is None:
+        cache.add(REPORT_EPOCH_KEY, time.time_ns(), None)
+        epoch = cache.get(REPORT_EPOCH_KEY)
+    return epoch
+
+
+def _empty_breakdown():
+    return {
+        'products': {},    # product_id -> [name, category, units, revenue, cost, lines]
+        'categories': {},  # category name -> [units, revenue, cost, lines, product ids]
+        'hours': {},       # hour -> [revenue, transactions]
+        'days': {},        # day -> [line revenue, line cost]
+    }
+
+
+def _compute_breakdown(sales, first, last):
+    """
+    Line breakdowns of sales on days first..last, one per day, in two
+    grouped queries over the whole span.
+    """
+    tz = timezone.get_current_timezone()
+    sales = sales.filter(**date_range_filter('created_at', first, last))
+    items = SaleItem.objects.filter(transaction__in=sales.values('pk')).annotate(
+        day=TruncDate('transaction__created_at', tzinfo=tz),
+    )
+    days = {}
+
+    for row in (
+        items.values('day', 'product_id', 'category_name')
+        .annotate(
+            name=Max('product_name'), units=Sum('quantity'),
+            revenue=Sum(line_revenue()), cost=Sum(line_cost()), lines=Count('id'),
+        )
+        .order_by()
+    ):
+        breakdown = days.setdefault(row['day'], _empty_breakdown())
+        revenue, cost = float(row['revenue'] or 0), float(row['cost'] or 0)
+        # A product recategorised within the day comes back once per category
+        product = breakdown['products'].setdefault(row['product_id'], [row['name'], row['category_name'], 0, 0.0, 0.0, 0])
+        product[0] = max(product[0], row['name'])
+        product[1] = max(product[1], row['category_name'])
+        product[2] += row['units']
+        product[3] += revenue
+        product[4] += cost
+        product[5] += row['lines']
+        category = breakdown['categories'].setdefault(row['category_name'], [0, 0.0, 0.0, 0, set()])
+        category[0] += row['units']
+        category[1] += revenue
+        category[2] += cost
+        category[3] += row['lines']
+        category[4].add(row['product_id'])
+        breakdown['days'].setdefault(row['day'], [0.0, 0.0])
+        breakdown['days'][row['day']][0] += revenue
+        breakdown['days'][row['day']][1] += cost
+
+    for row in (
+        sales.annotate(day=TruncDate('created_at', tzinfo=tz), hour=ExtractHour('created_at', tzinfo=tz))
+        .values('day', 'hour')
+        .annotate(revenue=Sum('total_amount'), count=Count('id'))
+        .order_by()
+    ):
+        days.setdefault(row['day'], _empty_breakdown())['hours'][row['hour']] = [float(row['revenue'] or 0), row['count']]
+
+    return days
+
+
+def _merge(parts):
+    merged = _empty_breakdown()
+    for part in parts:
+        for pid, (name, category, units, revenue, cost, lines) in part['products'].items():
+            # A product renamed within the range stays one row, under one of its recorded names
+            row = merged['products'].setdefault(pid, [name, category, 0, 0.0, 0.0, 0])
+            row[0] = max(row[0], name)
+            row[1] = max(row[1], category)
+            row[2] += units
+            row[3] += revenue
+            row[4] += cost
+            row[5] += lines
+        for name, (units, revenue, cost, lines, product_ids) in part['categories'].items():
+            row = merged['categories'].setdefault(name, [0, 0.0, 0.0, 0, set()])
+            row[0] += units
+            row[1] += revenue
+            row[2] += cost
+            row[3] += lines
+            row[4].update(product_ids)
+        for hour, (revenue, count) in part['hours'].items():
+            row = merged['hours'].setdefault(hour, [0.0, 0])
+            row[0] += revenue
+            row[1] += count
+        merged['days'].update(part['days'])
+    return merged
+
+
+def _resolve_range(sales, start, end):
+    """(start, end) with None filled in as first sale / today, end capped at today."""
+    today = timezone.localdate()
+    end = min(end or today, today)
+    if start is None:
+        first = sales.aggregate(first=Min('created_at'))['first']
+        start = timezone.localdate(first) if first else end
+    return start, end
+
+
+def _segments(start, end):
+    """
+    Split days start..end into the calendar months wholly inside it and the
+    loose days at either end, as (first, last) pairs.
+    """
+    segments, day = [], start
+    while day <= end:
+        month_end = (day.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+        if day.day == 1 and month_end <= end:
+            segments.append((day, month_end))
+            day = month_end + timedelta(days=1)
+        else:
+            segments.append((day, day))
+            day += timedelta(days=1)
+    return segments
+
+
+def line_breakdown(sales, start, end, params):
+    """
+    Product, category, hour-of-day and per-day line totals for store-local
+    days start..end. sales must already carry every non-date filter, and
+    params must identify those filters, since the closed days are cached
+    under them.
+    """
+    today = timezone.localdate()
+    parts = []
+    last_closed = min(end, today - timedelta(days=1))
+    if start <= last_closed:
+        generations = dict(
+            DailySalesRollup.objects.filter(day__gte=start, day__lte=last_closed)
+            .values('day').annotate(generation=Sum('generation')).order_by()
+            .values_list('day', 'generation')
+        )
+        prefix = 'report-segment:' + ':'.join(str(p) for p in params) + f':{_epoch()}'
+        keys = {}
+        for first, last in _segments(start, last_closed):
+            generation = sum(g for day, g in generations.items() if first <= day <= last)
+            keys[f'{prefix}:{first}:{last}:{generation}'] = (first, last)
+        cached = cache.get_many(keys)
+        parts.extend(cached.values())
+
+        missing = {key: span for key, span in keys.items() if key not in cached}
+        if missing:
+            days = _compute_breakdown(
+                sales, min(first for first, _ in missing.values()), max(last for _, last in missing.values()),
+            )
+            for key, (first, last) in missing.items():
+                segment = _merge(part for day, part in days.items() if first <= day <= last)
+                # Closed days only change through the rollup, which moves the key on
+                cache.set(key, segment, None)
+                parts.append(segment)
+    if start <= today <= end:
+        parts.extend(_compute_breakdown(sales, today, today).values())
+    return _merge(parts)
+
+
+# ─── Daily totals ────────────────────────────────────────────────────────────
+
+def _rollup_totals(start, end, cashier_id):
+    """([daily rows], {cashier_id: [total, transactions, units]}) from DailySalesRollup."""
+    rollups = DailySalesRollup.objects.filter(day__gte=start, day__lte=end)
+    if cashier_id:
+        rollups = rollups.filter(cashier__id=cashier_id)
+    daily = [
+        {'day': row['day'], 'total_sales': row['total_sales'], 'total_amount': float(row['total_amount'] or 0)}
+        for row in rollups.values('day')
+        .annotate(total_sales=Sum('transaction_count'), total_amount=Sum('revenue'))
+        .order_by('day')
+    ]
+    cashiers = {
+        row['cashier_id']: [float(row['total'] or 0), row['count'], row['units']]
+        for row in rollups.values('cashier_id')
+        .annotate(total=Sum('revenue'), count=Sum('transaction_count'), units=Sum('units'))
+        .order_by()
+    }
+    return daily, cashiers
+
+
+def _sale_totals(sales, start, end):
+    """The same as _rollup_totals, aggregated from the sales themselves."""
+    sales = sales.filter(**date_range_filter('created_at', start, end))
+    daily = [
+        {'day': row['day'], 'total_sales': row['total_sales'], 'total_amount': float(row['total_amount'] or 0)}
+        for row in sales.annotate(day=TruncDate('created_at', tzinfo=timezone.get_current_timezone()))
+        .values('day')
+        .annotate(total_sales=Count('id'), total_amount=Sum('total_amount'))
+        .order_by('day')
+    ]
+    cashiers = {
+        row['cashier_id']: [float(row['total'] or 0), row['count'], 0]
+        for row in sales.values('cashier_id').annotate(total=Sum('total_amount'), count=Count('id')).order_by()
+    }
+    for cashier_id, units in (
+        SaleItem.objects.filter(transaction__in=sales.values('pk'))
+        .values('transaction__cashier_id').annotate(units=Sum('quantity')).order_by()
+        .values_list('transaction__cashier_id', 'units')
+    ):
+        cashiers.setdefault(cashier_id, [0.0, 0, 0])[2] = units
+    return daily, cashiers
+
+
+# ─── Reports ─────────────────────────────────────────────────────────────────
+
+def _with_margin(row):
+    revenue = float(row.pop('revenue') or 0)
+    cost = float(row.pop('cost') or 0)
+    profit = revenue - cost
+    row.update(
+        revenue=round(revenue, 2),
+        cost=round(cost, 2),
+        gross_profit=round(profit, 2),
+        margin_pct=round((profit / revenue * 100) if revenue else 0, 2),
+    )
+    return row
+
+
+def margin_breakdown(breakdown):
+    """Summary plus by-product, by-category and by-day margins from line_breakdown()."""
+    by_product = [
+        _with_margin({
+            'id': pid,
+            'name': name,
+            'category': category or 'Uncategorized',
+            'units_sold': units,
+            'revenue': revenue,
+            'cost': cost,
+        })
+        for pid, (name, category, units, revenue, cost, _) in breakdown['products'].items()
+    ]
+
+    by_category = [
+        _with_margin({
+            'name': name or 'Uncategorized',
+            'units_sold': units,
+            'revenue': revenue,
+            'cost': cost,
+        })
+        for name, (units, revenue, cost, _, _) in breakdown['categories'].items()
+    ]
+
+    by_day = [
+        _with_margin({'date': day.isoformat(), 'revenue': revenue, 'cost': cost})
+        for day, (revenue, cost) in sorted(breakdown['days'].items())
+    ]
+
+    summary = _with_margin({
+        'revenue': sum(row['revenue'] for row in by_product),
+        'cost': sum(row['cost'] for row in by_product),
+    })
+
+    return {
+        'summary': {
+            'total_revenue': summary['revenue'],
+            'total_cost': summary['cost'],
+            'gross_profit': summary['gross_profit'],
+            'margin_pct': summary['margin_pct'],
+        },
+        'by_product': sorted(by_product, key=lambda x: x['gross_profit'], reverse=True),
+        'by_category': sorted(by_category, key=lambda x: x['gross_profit'], reverse=True),
+        'by_day': by_day,
+    }
+
+
+def sales_summary(breakdown, daily, cashiers):
+    """
+    Totals, daily summary, and product, category, cashier and hour-of-day
+    breakdowns — what the report page used to derive from every serialized
+    sale. Takes a line_breakdown() plus daily and per-cashier totals.
+    """
+    daily = [row for row in daily if row['total_sales']]
+    total_revenue = sum(row['total_amount'] for row in daily)
+    transactions = sum(row['total_sales'] for row in daily)
+
+    top_products = [
+        {
+            'id': pid,
+            'name': name,
+            'category': category or 'Uncategorized',
+            'quantity': units,
+            'revenue': revenue,
+            'transactions': lines,
+        }
+        for pid, (name, category, units, revenue, _, lines) in breakdown['products'].items()
+    ]
+    top_products.sort(key=lambda x: x['revenue'], reverse=True)
+
+    by_category = [
+        {
+            'name': name or 'Uncategorized',
+            'revenue': revenue,
+            'transactions': lines,
+            'product_count': len(product_ids),
+        }
+        for name, (_, revenue, _, lines, product_ids) in breakdown['categories'].items()
+    ]
+    by_category.sort(key=lambda x: x['revenue'], reverse=True)
+
+    # Names are resolved now rather than cached, so renames show up immediately
+    usernames = dict(Staff.objects.filter(pk__in=[c for c in cashiers if c]).values_list('pk', 'username'))
+    by_cashier = [
+        {
+            'cashier': usernames.get(cashier_id) or 'Unknown Cashier',
+            'total_sales': total,
+            'transactions': count,
+            'items_sold': units,
+            'average_sale': total / count,
+            'items_per_transaction': units / count,
+        }
+        for cashier_id, (total, count, units) in cashiers.items() if count
+    ]
+    by_cashier.sort(key=lambda x: x['total_sales'], reverse=True)
+
+    by_hour = [{'hour': hour, 'revenue': 0.0, 'transactions': 0} for hour in range(24)]
+    for hour, (revenue, count) in breakdown['hours'].items():
+        by_hour[hour].update(revenue=revenue, transactions=count)
+
+    return {
+        'totals': {
+            'revenue': round(total_revenue, 2),
+            'transactions': transactions,
+            'units': sum(units for _, _, units in cashiers.values()),
+            'average_sale': round(total_revenue / transactions, 2) if transactions else 0,
+        },
+        'daily_summary': [{**row, 'total_amount': round(row['total_amount'], 2)} for row in daily],
+        'top_products': top_products[:TOP_PRODUCTS],
+        'by_category': by_category,
+        'by_cashier': by_cashier,
+        'by_hour': by_hour,
+    }
+
+
+def report_sales(cashier_id=None, product_id=None):
+    """Sales under the report filters, plus the cache params naming them."""
+    sales = SaleTransaction.objects.all()
+    if cashier_id:
+        sales = sales.filter(cashier__id=cashier_id)
+    if product_id:
+        # EXISTS keeps one row per sale without a join + DISTINCT over every line
+        sales = sales.filter(Exists(SaleItem.objects.filter(transaction=OuterRef('pk'), product_id=product_id)))
+    return sales, ('sales', cashier_id or '-', product_id or '-')
+
+
+def sales_report_data(start=None, end=None, cashier_id=None, product_id=None):
+    """The summary-mode sales report for store-local days start..end."""
+    sales, params = report_sales(cashier_id, product_id)
+    start, end = _resolve_range(sales, start, end)
+    if start > end:
+        return sales_summary(_empty_breakdown(), [], {})
+    # The rollup is per day and cashier, so only a product filter needs raw sales
+    daily, cashiers = _sale_totals(sales, start, end) if product_id else _rollup_totals(start, end, cashier_id)
+    return sales_summary(line_breakdown(sales, start, end, params), daily, cashiers)
+
+
+def margin_report_data(start=None, end=None, cashier_id=None):
+    """The margin report for store-local days start..end."""
+    sales, params = report_sales(cashier_id)
+    start, end = _resolve_range(sales, start, end)
+    if start > end:
+        return margin_breakdown(_empty_breakdown())
+    return margin_breakdown(line_breakdown(sales, start, end, params))
@@ -0,0 +1,112 @@
+"""
+Daily sales rollup.
+
+DailySalesRollup keeps one row per (store-local day, cashier). Checkout adds
+each sale to its row inside the sale transaction, so daily summaries read a
+few hundred rows instead of aggregating raw SaleTransaction/SaleItem data.
+Today's rows also back the live counters in core.counters.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Sum, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailySalesRollup, SaleTransaction, SaleItem
+from .reports import line_cost, invalidate_reports
+from .dates import date_range_filter
+from .counters import invalidate_on_commit
+
+
+def _unassigned_row(day):
+    """
+    The day's rollup row for sales without a cashier, locked. Deleting staff
+    nulls their rows, so a day can have several; they are folded into the
+    oldest here so a sale is never applied to (or taken from) more than one.
+    """
+    rows = list(DailySalesRollup.objects.select_for_update().filter(day=day, cashier__isnull=True).order_by('pk'))
+    if len(rows) > 1:
+        keep, extra = rows[0], rows[1:]
+        for field in ('transaction_count', 'revenue', 'cost', 'units', 'generation'):
+            setattr(keep, field, sum(getattr(row, field) for row in rows))
+        keep.save(update_fields=['transaction_count', 'revenue', 'cost', 'units', 'generation'])
+        DailySalesRollup.objects.filter(pk__in=[row.pk for row in extra]).delete()
+    return DailySalesRollup.objects.filter(pk=rows[0].pk) if rows else DailySalesRollup.objects.none()
+
+
+def add_sale(sale, units, cost, sign=1):
+    """Fold one sale into its day's rollup row. sign=-1 takes a deleted sale back out."""
+    day = timezone.localdate(sale.created_at)
+    deltas = {
+        'transaction_count': F('transaction_count') + sign,
+        'revenue': F('revenue') + sign * sale.total_amount,
+        'cost': F('cost') + sign * cost,
+        'units': F('units') + sign * units,
+        'generation': F('generation') + 1,
+    }
+    invalidate_on_commit(day)
+    with transaction.atomic():
+        if sale.cashier_id is None:
+            # The unique constraint does not cover NULL, so filter(cashier_id=None) could match many rows
+            row = _unassigned_row(day)
+        else:
+            row = DailySalesRollup.objects.filter(day=day, cashier_id=sale.cashier_id)
+        if row.update(**deltas) or sign < 0:
+            return
+        try:
+            with transaction.atomic():
+                DailySalesRollup.objects.create(
+                    day=day, cashier_id=sale.cashier_id,
+                    transaction_count=1, revenue=sale.total_amount, cost=cost, units=units, generation=1,
+                )
+        except IntegrityError:
+            # Another worker created the row first
+            row.update(**deltas)
+
+
+def remove_sale(sale):
+    lines = sale.items.aggregate(units=Sum('quantity'), cost=Sum(line_cost()))
+    add_sale(sale, lines['units'] or 0, lines['cost'] or 0, sign=-1)
+
+
+@transaction.atomic
+def rebuild_rollups(start=None, end=None):
+    """Recompute rollup rows for store-local days start..end (inclusive; None = open-ended)."""
+    sales = SaleTransaction.objects.filter(**date_range_filter('created_at', start, end))
+    items = SaleItem.objects.filter(**date_range_filter('transaction__created_at', start, end))
+    rollups = DailySalesRollup.objects.all()
+    if start:
+        rollups = rollups.filter(day__gte=start)
+    if end:
+        rollups = rollups.filter(day__lte=end)
+
+    tz = timezone.get_current_timezone()
+    rows = {}
+    totals = (
+        sales.annotate(day=TruncDate('created_at', tzinfo=tz))
+        .values('day', 'cashier_id')
+        .annotate(count=Count('id'), revenue=Sum('total_amount'))
+        .order_by()
+    )
+    for t in totals:
+        rows[(t['day'], t['cashier_id'])] = DailySalesRollup(
+            day=t['day'], cashier_id=t['cashier_id'],
+            transaction_count=t['count'], revenue=t['revenue'] or 0,
+        )
+    lines = (
+        items.annotate(day=TruncDate('transaction__created_at', tzinfo=tz))
+        .values('day', 'transaction__cashier_id')
+        .annotate(units=Sum('quantity'), cost=Sum(line_cost()))
+        .order_by()
+    )
+    for line in lines:
+        row = rows.get((line['day'], line['transaction__cashier_id']))
+        if row:
+            row.units = line['units'] or 0
+            row.cost = line['cost'] or 0
+
+    rollups.delete()
+    DailySalesRollup.objects.bulk_create(rows.values(), batch_size=1000)
+    invalidate_on_commit(timezone.localdate())
+    # Rebuilt rows start their generations over, so cached reports must go
+    invalidate_reports()
+    return len(rows)
@@ -1,9 +1,10 @@
 # serializers.py
 from rest_framework import serializers
-from .models import Category, Product, SaleTransaction, SaleItem, Staff, Restock, Customer, CustomerTransaction, LoyaltySettings, BulkDiscount, AuditLog, StoreSettings
-from rest_framework.exceptions import ValidationError
+from .models import Category, Product, SaleTransaction, SaleItem, Staff, Restock, Customer, CustomerTransaction, LoyaltySettings, BulkDiscount, AuditLog, StoreSettings, ReportJob, StockMovement, ProductImportJob
 from django.db import transaction
-from django.db.models import F
+from django.db.models import prefetch_related_objects
+from .checkout import create_sale
+from .stock import adjust_stock, record_initial_stock
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework_simplejwt.views import TokenObtainPairView
 import re
@@ -100,10 +101,13 @@ class ProductSerializer(serializers.ModelSerializer):
     unit_price = serializers.ReadOnlyField()
     display_price = serializers.ReadOnlyField()
     bulk_discounts = serializers.SerializerMethodField()
+    # The stock level the client showed when the edit began; stock is then
+    # changed by (stock - expected_stock) rather than set outright
+    expected_stock = serializers.IntegerField(write_only=True, required=False, min_value=0)
 
     class Meta:
         model = Product
-        fields = ['id', 'name', 'category', 'category_id', 'price', 'cost_price', 'stock', 'barcode', 'created_at', 'is_bulk_product', 'bulk_quantity','bulk_price', 'unit_of_measure', 'unit_price', 'display_price', 'bulk_discounts']
+        fields = ['id', 'name', 'category', 'category_id', 'price', 'cost_price', 'stock', 'expected_stock', 'barcode', 'created_at', 'is_bulk_product', 'bulk_quantity','bulk_price', 'unit_of_measure', 'unit_price', 'display_price', 'bulk_discounts']
 
     def validate_name(self, value):
         if len(value.strip()) < 2:
@@ -136,9 +140,39 @@ class ProductSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Barcode too long")
         return value
 
+    def _staff(self):
+        request = self.context.get('request')
+        return request.user if request and request.user.is_authenticated else None
+
+    def create(self, validated_data):
+        validated_data.pop('expected_stock', None)
+        with transaction.atomic():
+            product = super().create(validated_data)
+            record_initial_stock([product], StockMovement.OPENING, user=self._staff())
+        return product
+
+    def update(self, instance, validated_data):
+        # Stock is never saved as an absolute value read earlier. A client that
+        # sends expected_stock (the level its form showed) has its edit applied
+        # as the difference, so sales made while the form was open survive;
+        # without it the edit is measured against the row as loaded now.
+        new_stock = validated_data.pop('stock', None)
+        expected = validated_data.pop('expected_stock', None)
+        with transaction.atomic():
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            if validated_data:
+                instance.save(update_fields=list(validated_data))
+            delta = 0 if new_stock is None else new_stock - (instance.stock if expected is None else expected)
+            if delta:
+                instance.stock = adjust_stock(instance.pk, delta, StockMovement.ADJUSTMENT, user=self._staff())
+        return instance
+
     def get_bulk_discounts(self, obj):
-        active_discounts = obj.bulk_discounts.filter(is_active=True)
-        return BulkDiscountSerializer(active_discounts, many=True).data
+        # List endpoints prefetch this; single objects (create/update responses) fetch it here
+        if not hasattr(obj, 'active_bulk_discounts'):
+            prefetch_related_objects([obj], BulkDiscount.active_prefetch())
+        return BulkDiscountSerializer(obj.active_bulk_discounts, many=True).data
     
     def validate(self, data):
         # Additional validation: cost price should not be higher than selling price
@@ -176,9 +210,8 @@ class ProductSerializer(serializers.ModelSerializer):
 
 class SaleItemSerializer(serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
-    product_id = serializers.PrimaryKeyRelatedField(
-        queryset=Product.objects.all(), source='product', write_only=True
-    )
+    # Resolved (and locked) for the whole basket in one query by core.checkout
+    product_id = serializers.IntegerField(write_only=True, min_value=1)
 
     class Meta:
         model = SaleItem
@@ -209,7 +242,7 @@ class SaleTransactionSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = SaleTransaction
-        fields = ['id', 'cashier', 'total_amount', 'paid_amount', 'change_given', 'created_at', 'items', 'customer_name', 'customer_id']
+        fields = ['id', 'cashier', 'total_amount', 'paid_amount', 'change_given', 'created_at', 'items', 'customer_name', 'customer_id', 'offline_id']
 
     def validate_total_amount(self, value):
         if value <= 0:
@@ -255,7 +288,6 @@ class SaleTransactionSerializer(serializers.ModelSerializer):
 
         return data
 
-    @transaction.atomic
     def create(self, validated_data):
         items_data = validated_data.pop('items')
         customer = validated_data.pop('customer', None)
@@ -264,49 +296,19 @@ class SaleTransactionSerializer(serializers.ModelSerializer):
         if request:
             logger.info('Sale created by %s from %s', request.user.username, request.META.get('REMOTE_ADDR'))
 
-        # Create the sale transaction WITH the customer
-        transaction_instance = SaleTransaction.objects.create(
-            **validated_data,
-            customer=customer
-        )
-
-        for item_data in items_data:
-            product = item_data['product']
-            quantity = item_data['quantity']
-
-            if product.stock < quantity:
-                raise ValidationError(f"Insufficient stock for {product.name}. Available: {product.stock}, Requested: {quantity}")
-
-            # Deduct stock
-            product.stock -= quantity
-            product.save()
-
-            # Create SaleItem
-            SaleItem.objects.create(transaction=transaction_instance, **item_data)
-
-        # Award loyalty points and update customer stats (atomic to avoid race conditions)
-        if customer:
-            total = float(transaction_instance.total_amount)
-            loyalty_settings = LoyaltySettings.objects.filter(is_active=True).first()
-            if loyalty_settings and float(loyalty_settings.points_per_amount) >= 1:
-                points_earned = int(total / float(loyalty_settings.points_per_amount))
-            else:
-                points_earned = int(total / 100)
+        return create_sale(validated_data, items_data, customer=customer)
 
-            # F() expressions update atomically in the database — no race condition
-            Customer.objects.filter(pk=customer.pk).update(
-                loyalty_points=F('loyalty_points') + points_earned,
-                total_spent=F('total_spent') + total,
-                total_visits=F('total_visits') + 1,
-            )
 
-            CustomerTransaction.objects.create(
-                customer=customer,
-                sale=transaction_instance,
-                points_earned=points_earned,
-            )
+class SaleTransactionListSerializer(serializers.ModelSerializer):
+    """Compact row for sale listings — line detail lives on the retrieve endpoint."""
+    cashier = serializers.StringRelatedField(read_only=True)
+    customer_name = serializers.CharField(source='customer.name', read_only=True, allow_null=True)
+    item_count = serializers.IntegerField(read_only=True)
+    units = serializers.IntegerField(read_only=True)
 
-        return transaction_instance
+    class Meta:
+        model = SaleTransaction
+        fields = ['id', 'cashier', 'total_amount', 'paid_amount', 'change_given', 'created_at', 'item_count', 'units', 'customer_name']
 
 
 class StaffSerializer(serializers.ModelSerializer):
@@ -423,6 +425,22 @@ class AuditLogSerializer(serializers.ModelSerializer):
         fields = ['id', 'action', 'model_name', 'object_id', 'object_repr', 'changed_by_username', 'timestamp', 'changes']
 
 
+class ReportJobSerializer(serializers.ModelSerializer):
+    """Job status for polling — the result itself is fetched separately once done."""
+    class Meta:
+        model = ReportJob
+        fields = ['id', 'kind', 'params', 'status', 'error', 'created_at', 'started_at', 'finished_at']
+
+
+class ProductImportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ProductImportJob
+        fields = [
+            'id', 'filename', 'atomic', 'dry_run', 'status', 'rows_read', 'created', 'updated', 'unchanged',
+            'error_count', 'errors', 'preview', 'error', 'created_at', 'started_at', 'finished_at',
+        ]
+
+
 class StoreSettingsSerializer(serializers.ModelSerializer):
     class Meta:
         model = StoreSettings
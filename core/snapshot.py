@@ -0,0 +1,94 @@
+"""
+Pre-rendered product catalogue.
+
+Serializing every product (nested category, display_price formatting,
+unit_price division, discounts) is the most expensive read we serve, yet
+everything but stock only changes with pricing_version(). The serialized
+products are therefore built once per pricing version and shared across
+gunicorn workers through the cache, under one fixed key that each new build
+overwrites.
+
+Every sale still moves the catalogue ETag, since stock is part of the
+payload. A worker that sees a new ETag reads just the product stock levels,
+patches them into the shared products and renders the JSON, keeping that in
+process memory so repeat hits are a plain bytes copy. The compressed
+variants are made the first time a client asks for them.
+"""
+import gzip
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+
+from .catalogue import catalogue_queryset, pricing_version
+from .models import Product
+from .serializers import ProductSerializer
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+SNAPSHOT_KEY = 'catalogue-snapshot'
+SNAPSHOT_TIMEOUT = 60 * 60 * 24
+
+# Newest pricing this worker has seen: {'version': ..., 'products': [...]}
+_pricing = {}
+# Newest rendering this worker has seen: {'etag': ..., 'variants': {...}}
+_local = {}
+
+
+def build_products():
+    return [dict(product) for product in ProductSerializer(catalogue_queryset(), many=True).data]
+
+
+def _priced_products():
+    """Serialized products for the current pricing version, with the stock they were built with."""
+    version = pricing_version()
+    if _pricing.get('version') != version:
+        cached_version, products = cache.get(SNAPSHOT_KEY, (None, None))
+        if cached_version != version:
+            products = build_products()
+            cache.set(SNAPSHOT_KEY, (version, products), SNAPSHOT_TIMEOUT)
+        _pricing.clear()
+        _pricing.update(version=version, products=products)
+    return _pricing['products']
+
+
+def get_snapshot(etag):
+    if _local.get('etag') != etag:
+        stock = dict(Product.objects.values_list('id', 'stock'))
+        products = [{**product, 'stock': stock.get(product['id'], product['stock'])} for product in _priced_products()]
+        _local.clear()
+        _local.update(etag=etag, variants={'identity': JSONRenderer().render(products)})
+    return _local['variants']
+
+
+def _encode(variants, encoding):
+    if encoding not in variants:
+        body = variants['identity']
+        variants[encoding] = gzip.compress(body, compresslevel=6) if encoding == 'gzip' else brotli.compress(body, quality=5)
+    return variants[encoding]
+
+
+def _accepted_encodings(header):
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        if params.strip().replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def catalogue_snapshot_response(request, etag):
+    variants = get_snapshot(etag)
+    accepted = _accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    encodings = ('br', 'gzip') if brotli is not None else ('gzip',)
+    encoding = next((e for e in encodings if e in accepted), 'identity')
+
+    response = HttpResponse(_encode(variants, encoding), content_type='application/json')
+    if encoding != 'identity':
+        response['Content-Encoding'] = encoding
+    response['Vary'] = 'Accept-Encoding'
+    return response
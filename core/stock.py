@@ -0,0 +1,92 @@
+"""
+Stock mutation service.
+
+Every path that changes Product.stock (sales, restocks, uploads, manual
+adjustments) goes through apply_stock_deltas so stock is only ever moved by
+relative F() deltas in a single guarded UPDATE — never by saving an absolute
+value read earlier. Concurrent gunicorn workers therefore cannot lose each
+other's updates, and no row is locked before the UPDATE itself.
+
+The same transaction appends one StockMovement per product, so the ledger
+always sums to Product.stock. Stock set on a new product is recorded with
+record_initial_stock.
+"""
+from django.db import transaction
+from django.db.models import Case, When, F, Q, PositiveIntegerField
+from rest_framework.exceptions import ValidationError
+
+from .models import Product, StockMovement
+from .catalogue import record_changes
+
+
+class InsufficientStock(ValidationError):
+    """Raised when one or more decrements would take stock below zero."""
+
+    def __init__(self, shortfalls):
+        self.shortfalls = shortfalls
+        super().__init__([
+            f"Insufficient stock for {s['name']}. Available: {s['available']}, Requested: {s['requested']}"
+            for s in shortfalls
+        ])
+
+
+def _shortfalls(deltas):
+    needed = {pid: -delta for pid, delta in deltas.items() if delta < 0}
+    rows = Product.objects.filter(pk__in=needed).values_list('pk', 'name', 'stock')
+    found = {pk: (name, stock) for pk, name, stock in rows}
+    shortfalls = []
+    for pid, qty in sorted(needed.items()):
+        name, stock = found.get(pid, (f'product #{pid}', 0))
+        if stock < qty:
+            shortfalls.append({'product_id': pid, 'name': name, 'available': stock, 'requested': qty})
+    return shortfalls
+
+
+def apply_stock_deltas(deltas, reason, sale=None, user=None):
+    """
+    Apply {product_id: signed quantity} in one UPDATE and record it in the
+    ledger under reason. Decrements are guarded by stock__gte so a row that
+    cannot cover its line is left untouched; if any line falls short the
+    whole batch is rolled back and InsufficientStock reports every short line.
+    """
+    deltas = {pid: delta for pid, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    guard = Q()
+    whens = []
+    for pid, delta in sorted(deltas.items()):
+        guard |= Q(pk=pid, stock__gte=-delta) if delta < 0 else Q(pk=pid)
+        whens.append(When(pk=pid, then=F('stock') + delta))
+
+    with transaction.atomic():
+        updated = Product.objects.filter(guard).update(
+            stock=Case(*whens, default=F('stock'), output_field=PositiveIntegerField())
+        )
+        if updated != len(deltas):
+            shortfalls = _shortfalls(deltas)
+            if shortfalls:
+                raise InsufficientStock(shortfalls)
+            missing = set(deltas) - set(Product.objects.filter(pk__in=deltas).values_list('pk', flat=True))
+            if missing:
+                raise ValidationError({'product_id': f'Product(s) not found: {", ".join(str(m) for m in sorted(missing))}'})
+            raise ValidationError('Stock changed while updating. Please retry.')
+        StockMovement.objects.bulk_create([
+            StockMovement(product_id=pid, quantity=delta, reason=reason, sale=sale, created_by=user)
+            for pid, delta in sorted(deltas.items())
+        ])
+        record_changes('Product', deltas, stock_only=True)
+
+
+def adjust_stock(product_id, delta, reason, user=None):
+    """Apply a single signed delta and return the resulting stock level."""
+    apply_stock_deltas({product_id: delta}, reason, user=user)
+    return Product.objects.filter(pk=product_id).values_list('stock', flat=True).first()
+
+
+def record_initial_stock(products, reason, user=None):
+    """Ledger entries for the stock newly created products started with."""
+    StockMovement.objects.bulk_create([
+        StockMovement(product=product, quantity=product.stock, reason=reason, created_by=user)
+        for product in products if product.stock
+    ])
@@ -1,3 +1,92 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import jobs
+from .catalogue import current_version, oldest_version, prune_changes, record_changes
+from .models import CatalogueChange, Category, Product, Staff
+
+
+class CatalogueFeedPruneTests(TestCase):
+    def setUp(self):
+        user = Staff.objects.create_user(username='cashier', password='x' * 8, is_cashier=True)
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        category = Category.objects.create(name='Drinks')
+        self.products = [
+            Product.objects.create(name=f'P{i}', category=category, price=Decimal('100'), cost_price=Decimal('60'), stock=10, barcode=f'B{i}')
+            for i in range(3)
+        ]
+        for product in self.products:
+            record_changes('Product', [product.pk], stock_only=True)
+
+    def changes(self, since):
+        response = self.client.get('/api/catalogue/changes/', {'since': since})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_cursor_below_pruned_feed_gets_full_resync(self):
+        stale_cursor = current_version() - 2
+        CatalogueChange.objects.exclude(id=current_version()).update(changed_at=timezone.now() - timedelta(days=40))
+
+        self.assertEqual(prune_changes(timedelta(days=30)), 2)
+        self.assertGreater(oldest_version(), stale_cursor - 1)
+
+        body = self.changes(stale_cursor - 1)
+        self.assertTrue(body['full'])
+        self.assertEqual(len(body['products']), 3)
+
+    def test_cursor_within_retained_feed_gets_delta(self):
+        CatalogueChange.objects.filter(id__lt=current_version()).update(changed_at=timezone.now() - timedelta(days=40))
+        prune_changes(timedelta(days=30))
+
+        body = self.changes(oldest_version())
+        self.assertFalse(body['full'])
+        self.assertEqual([p['id'] for p in body['products']], [self.products[-1].pk])
+
+    def test_newest_row_is_never_pruned(self):
+        version = current_version()
+        CatalogueChange.objects.update(changed_at=timezone.now() - timedelta(days=40))
+
+        prune_changes(timedelta(days=30))
+        self.assertEqual(current_version(), version)
+
+
+@mock.patch('core.product_import.CHUNK_ROWS', 2)
+class BackgroundImportPreviewTests(TestCase):
+    def setUp(self):
+        user = Staff.objects.create_user(username='manager', password='x' * 8, is_manager=True)
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        Product.objects.create(name='Cola', price=Decimal('100'), cost_price=Decimal('60'), stock=10, barcode='COLA')
+
+    def run_job(self, **data):
+        response = self.client.post('/api/products/bulk-upload/', {'file': self.upload, 'mode': 'background', **data}, format='multipart')
+        self.assertEqual(response.status_code, 202)
+        jobs.run(jobs.claim_next())
+        return self.client.get(f'/api/products/import-jobs/{response.json()["id"]}/').json()
+
+    def test_barcode_repeated_in_later_chunk_previews_its_last_row(self):
+        # Chunks of two rows: each barcode's second row lands in the second chunk
+        self.upload = SimpleUploadedFile('products.csv', (
+            'name,price,cost_price,stock,barcode\n'
+            'Cola,120,60,10,COLA\n'
+            'Water,50,20,5,WATER\n'
+            'Cola,150,60,10,COLA\n'
+            'Water,55,20,5,WATER\n'
+        ).encode())
+
+        job = self.run_job(dry_run='true')
+        self.assertEqual((job['created'], job['updated'], job['unchanged']), (1, 1, 0))
+        self.assertEqual([(item['row'], item['changes']['price']['new']) for item in job['preview']['changes']], [(4, '150.00')])
+        self.assertEqual([item['row'] for item in job['preview']['new_products']], [5])
 
-# Create your tests here.
+        self.upload.seek(0)
+        self.run_job()
+        self.assertEqual(Product.objects.get(barcode='COLA').price, Decimal('150'))
+        self.assertEqual(Product.objects.get(barcode='WATER').price, Decimal('55'))
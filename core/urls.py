@@ -2,14 +2,16 @@ from rest_framework.routers import DefaultRouter
 from django.urls import path, include
 from .views import (
     CategoryViewSet, ProductViewSet, SaleTransactionViewSet, StaffViewSet,
-    ProductListView, restock_product, sales_report, RestockHistoryViewSet,
+    ProductListView, restock_product, restock_batch, sales_report, RestockHistoryViewSet,
     CustomerViewSet, CustomerTransactionViewSet, LoyaltySettingsViewSet,
     redeem_loyalty_points, store_today_sales, user_today_performance,
     BulkDiscountViewSet, register_staff,
     AuditedCategoryViewSet, AuditedProductViewSet, AuditLogViewSet,
-    low_stock_alerts, download_product_template, bulk_upload_products,
-    margin_report, get_store_settings, update_store_settings,
+    low_stock_alerts, download_product_template, bulk_upload_products, export_products,
+    margin_report, product_import_status, commit_product_import, get_store_settings, update_store_settings,
     update_staff, reset_staff_password, delete_staff,
+    sync_sales_batch, catalogue_changes, product_by_barcode, products_by_barcodes,
+    dashboard, export_sales, stock_at_time, submit_report_job, report_job_status, report_job_result,
 )
 
 router = DefaultRouter()
@@ -25,20 +27,34 @@ router.register(r'bulk-discounts', BulkDiscountViewSet, basename='bulk-discounts
 router.register(r'audit-log', AuditLogViewSet, basename='audit-log')
 
 urlpatterns = [
-    # Custom product sub-routes MUST come before include(router.urls)
+    # Custom product/sales sub-routes MUST come before include(router.urls)
     # otherwise the router matches products/<pk>/ and swallows them
     path('products/download-template/', download_product_template, name='product-template'),
     path('products/bulk-upload/', bulk_upload_products, name='bulk-upload'),
+    path('products/export/', export_products, name='product-export'),
+    path('products/import-jobs/<int:pk>/', product_import_status, name='product-import-status'),
+    path('products/import-jobs/<int:pk>/commit/', commit_product_import, name='product-import-commit'),
+    path('products/by-barcode/', products_by_barcodes, name='products-by-barcodes'),
+    path('products/by-barcode/<str:code>/', product_by_barcode, name='product-by-barcode'),
+    path('products/stock-at/', stock_at_time, name='stock-at'),
+    path('sales/batch/', sync_sales_batch, name='sales-batch'),
+    path('sales/export/', export_sales, name='sales-export'),
 
     path('', include(router.urls)),
     path('restock/', restock_product, name='restock_product'),
+    path('restock/batch/', restock_batch, name='restock-batch'),
     path('sales-report/', sales_report, name='sales-report'),
     path('store-today-sales/', store_today_sales, name='store-today-sales'),
     path('user-today-performance/', user_today_performance, name='user-today-performance'),
     path('redeem-points/', redeem_loyalty_points, name='redeem-points'),
     path('register-staff/', register_staff, name='register-staff'),
     path('low-stock-alerts/', low_stock_alerts, name='low-stock-alerts'),
+    path('dashboard/', dashboard, name='dashboard'),
     path('margin-report/', margin_report, name='margin-report'),
+    path('reports/jobs/', submit_report_job, name='report-jobs'),
+    path('reports/jobs/<int:pk>/', report_job_status, name='report-job-status'),
+    path('reports/jobs/<int:pk>/result/', report_job_result, name='report-job-result'),
+    path('catalogue/changes/', catalogue_changes, name='catalogue-changes'),
     path('store-settings/', get_store_settings, name='store-settings'),
     path('store-settings/update/', update_store_settings, name='store-settings-update'),
     path('staff/<int:pk>/update/', update_staff, name='update-staff'),
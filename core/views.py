@@ -9,18 +9,39 @@ from rest_framework.throttling import UserRateThrottle, AnonRateThrottle, Scoped
 import logging
 
 logger = logging.getLogger(__name__)
-from django.db.models import Sum, Count, F, FloatField, ExpressionWrapper
-from django.utils.dateparse import parse_date
+from django.db.models import Sum, Count, Max, F, Q, FloatField, ExpressionWrapper
+from django.apps import apps
 from django.utils import timezone
 from datetime import timedelta
 from django.http import HttpResponse
-from .permissions import IsManagerOrAdmin, IsCashier, IsCashierOrManager, make_tier_permission, tier_block_response
+from django.utils.http import parse_etags
+from django.utils.dateparse import parse_datetime
+from django.db import transaction as db_transaction, IntegrityError
+from rest_framework.exceptions import ValidationError
+from .permissions import IsManagerOrAdmin, IsCashier, IsCashierOrManager, make_tier_permission, tier_block_response, plan_has_feature
 from .tier_config import CASHIER_LIMITS
-from .models import Category, Product, SaleTransaction, SaleItem, Staff, Restock, Customer, CustomerTransaction, LoyaltySettings, BulkDiscount, AuditLog, StoreSettings
+from .stock import adjust_stock, apply_stock_deltas
+from .pagination import KeysetPagination
+from .catalogue import (
+    record_change, record_pre_deletion,
+    current_version, settled_version, oldest_version, changed_ids_since, catalogue_etag,
+    catalogue_queryset,
+)
+from .snapshot import catalogue_snapshot_response
+from .barcodes import barcode_cache, MAX_BATCH_BARCODES
+from .rollups import remove_sale as remove_sale_from_rollup
+from .counters import store_today, cashier_today
+from .reports import report_sales, margin_report_data, sales_report_data
+from .exports import sale_line_rows, product_rows, csv_response, xlsx_response, stored_file_response, XLSX_SYNC_ROWS
+from .ledger import stock_at
+from .product_import import SheetError, reader_for, validate_row, import_products, preview_import, commit_preview, store_upload, CHUNK_ROWS, MAX_REPORTED_ERRORS
+from .dates import parse_day, date_range_filter
+from .models import Category, Product, SaleTransaction, SaleItem, Staff, Restock, Customer, CustomerTransaction, LoyaltySettings, BulkDiscount, AuditLog, StoreSettings, DailySalesRollup, ReportJob, StockMovement, ProductImportJob
 from .serializers import (
     CategorySerializer,
     ProductSerializer,
     SaleTransactionSerializer,
+    SaleTransactionListSerializer,
     StaffSerializer,
     RestockSerializer,
     CustomerSerializer,
@@ -29,13 +50,16 @@ from .serializers import (
     BulkDiscountSerializer,
     AuditLogSerializer,
     StoreSettingsSerializer,
+    ReportJobSerializer,
+    ProductImportJobSerializer,
 )
 from rest_framework_simplejwt.views import TokenObtainPairView
 from .serializers import CustomTokenObtainPairSerializer
-from django.db.models.functions import TruncDate
+from django.db.models.functions import Coalesce
 import openpyxl
 from openpyxl.styles import Font, PatternFill, Alignment
 from io import BytesIO
+from itertools import islice
 
 
 # Custom Throttle Classes
@@ -55,39 +79,95 @@ class CustomTokenObtainPairView(TokenObtainPairView):
     throttle_classes = [LoginRateThrottle]
 
 
+def conditional_response(request, etag, render, cache_control='private, no-cache'):
+    """
+    Answer If-None-Match with a bare 304 before render() runs, so unchanged
+    resources cost neither serialization nor bandwidth. no-cache makes
+    clients revalidate every time, so changes still show up immediately.
+    """
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match and (if_none_match.strip() == '*' or etag in parse_etags(if_none_match)):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = render()
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    return response
+
+
+class CatalogueChangeMixin:
+    """Mix into product/category/discount viewsets so every write reaches the terminal change feed."""
+
+    def perform_create(self, serializer):
+        with db_transaction.atomic():
+            super().perform_create(serializer)
+            record_change(serializer.instance)
+
+    def perform_update(self, serializer):
+        with db_transaction.atomic():
+            super().perform_update(serializer)
+            record_change(serializer.instance)
+
+    def perform_destroy(self, instance):
+        pk = instance.pk
+        with db_transaction.atomic():
+            record_pre_deletion(instance)
+            super().perform_destroy(instance)
+            record_change(instance, pk)
+
+
 class ProductListView(APIView):
     permission_classes = [IsAuthenticated]
     throttle_classes = [SustainedRateThrottle]
 
     def get(self, request):
-        products = Product.objects.all().prefetch_related('bulk_discounts')
+        products = catalogue_queryset()
         serializer = ProductSerializer(products, many=True)
         return Response(serializer.data)
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(CatalogueChangeMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticated, IsManagerOrAdmin]
     throttle_classes = [SustainedRateThrottle]
 
 
-class ProductViewSet(viewsets.ModelViewSet):
-    queryset = Product.objects.all().prefetch_related('bulk_discounts')
+class ProductViewSet(CatalogueChangeMixin, viewsets.ModelViewSet):
+    queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticated]
     throttle_classes = [SustainedRateThrottle]
 
+    def get_queryset(self):
+        return catalogue_queryset()
+
 
 class SaleTransactionViewSet(viewsets.ModelViewSet):
     queryset = SaleTransaction.objects.all().order_by('-created_at')
     serializer_class = SaleTransactionSerializer
     permission_classes = [IsCashierOrManager]
-    pagination_class = None
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        qs = super().get_queryset().select_related('cashier', 'customer')
+        if self.action == 'list':
+            return qs.annotate(item_count=Count('items'), units=Coalesce(Sum('items__quantity'), 0))
+        return qs.prefetch_related('items__product__category', BulkDiscount.active_prefetch('items__product__bulk_discounts'))
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return SaleTransactionListSerializer
+        return SaleTransactionSerializer
 
     def perform_create(self, serializer):
         serializer.save(cashier=self.request.user)
 
+    def perform_destroy(self, instance):
+        with db_transaction.atomic():
+            remove_sale_from_rollup(instance)
+            instance.delete()
+
 
 class StaffViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Staff.objects.all()
@@ -162,14 +242,24 @@ def restock_product(request):
     if not product_id or not quantity:
         return Response({"error": "Missing product_id or quantity"}, status=status.HTTP_400_BAD_REQUEST)
 
+    try:
+        quantity = int(quantity)
+    except (TypeError, ValueError):
+        return Response({"error": "Quantity must be a whole number"}, status=status.HTTP_400_BAD_REQUEST)
+    if quantity <= 0:
+        return Response({"error": "Quantity must be positive"}, status=status.HTTP_400_BAD_REQUEST)
+
     try:
         product = Product.objects.get(id=product_id)
-        product.stock += int(quantity)
-        product.save()
+    except (Product.DoesNotExist, ValueError):
+        return Response({"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    with db_transaction.atomic():
+        new_stock = adjust_stock(product.pk, quantity, StockMovement.RESTOCK, user=request.user)
 
         restock = Restock.objects.create(
             product=product,
-            quantity_added=int(quantity),
+            quantity_added=quantity,
             restocked_by=request.user
         )
 
@@ -179,80 +269,299 @@ def restock_product(request):
             object_id=str(restock.pk),
             object_repr=f'{product.name} +{quantity}',
             changed_by=request.user,
-            changes={'product': product.name, 'quantity_added': int(quantity), 'new_stock': product.stock},
+            changes={'product': product.name, 'quantity_added': quantity, 'new_stock': new_stock},
         )
-        logger.info('Restock: %s +%s by %s', product.name, quantity, request.user.username)
+    logger.info('Restock: %s +%s by %s', product.name, quantity, request.user.username)
 
-        return Response({"message": "Stock updated successfully", "stock": product.stock})
-    except Product.DoesNotExist:
-        return Response({"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
+    return Response({"message": "Stock updated successfully", "stock": new_stock})
+
+
+MAX_RESTOCK_LINES = 500
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, IsManagerOrAdmin])
+@throttle_classes([BurstRateThrottle])
+def restock_batch(request):
+    """
+    Receive a whole delivery: {"items": [{"product_id" or "barcode", "quantity"}]}.
+    Every line is checked before anything is written; then all stock moves in
+    one UPDATE and the Restock and AuditLog rows are bulk-inserted, in a single
+    transaction. Lines naming the same product are added together.
+    """
+    items = request.data.get('items')
+    if not isinstance(items, list) or not items:
+        return Response({'error': 'Provide a non-empty "items" list'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(items) > MAX_RESTOCK_LINES:
+        return Response(
+            {'error': f'Too many lines. Maximum allowed is {MAX_RESTOCK_LINES} per delivery.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    errors, lines = [], []
+    for line, item in enumerate(items, start=1):
+        if not isinstance(item, dict):
+            errors.append({'line': line, 'error': 'Each line must be an object'})
+            continue
+        try:
+            quantity = int(item.get('quantity'))
+        except (TypeError, ValueError):
+            errors.append({'line': line, 'error': 'Quantity must be a whole number'})
+            continue
+        if quantity <= 0:
+            errors.append({'line': line, 'error': 'Quantity must be positive'})
+            continue
+        product_id = str(item.get('product_id') or '').strip()
+        barcode = str(item.get('barcode') or '').strip()
+        if product_id and not product_id.isdigit():
+            errors.append({'line': line, 'error': 'product_id must be an id'})
+        elif not product_id and not barcode:
+            errors.append({'line': line, 'error': 'Provide product_id or barcode'})
+        else:
+            lines.append((line, int(product_id) if product_id else None, barcode, quantity))
+
+    products = Product.objects.filter(
+        Q(pk__in=[pid for _, pid, _, _ in lines if pid]) |
+        Q(barcode__in=[code for _, pid, code, _ in lines if not pid])
+    ).only('pk', 'name', 'barcode')
+    by_id = {p.pk: p for p in products}
+    by_barcode = {p.barcode: p for p in by_id.values()}
+
+    deltas = {}
+    for line, pid, barcode, quantity in lines:
+        product = by_id.get(pid) if pid else by_barcode.get(barcode)
+        if product is None:
+            errors.append({'line': line, 'error': f'Product not found: {pid or barcode}'})
+        else:
+            deltas[product.pk] = deltas.get(product.pk, 0) + quantity
+
+    if errors:
+        return Response({
+            'errors': sorted(errors, key=lambda e: e['line']),
+            'message': 'Nothing was restocked. Fix the errors and resend the delivery.',
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    with db_transaction.atomic():
+        apply_stock_deltas(deltas, StockMovement.RESTOCK, user=request.user)
+        levels = dict(Product.objects.filter(pk__in=deltas).values_list('pk', 'stock'))
+        restocks = Restock.objects.bulk_create([
+            Restock(product_id=pk, quantity_added=quantity, restocked_by=request.user)
+            for pk, quantity in deltas.items()
+        ])
+        AuditLog.objects.bulk_create([
+            AuditLog(
+                action='CREATE',
+                model_name='Restock',
+                object_id=str(restock.pk),
+                object_repr=f'{by_id[restock.product_id].name} +{restock.quantity_added}'[:200],
+                changed_by=request.user,
+                changes={
+                    'product': by_id[restock.product_id].name,
+                    'quantity_added': restock.quantity_added,
+                    'new_stock': levels[restock.product_id],
+                    'source': 'restock_batch',
+                },
+            )
+            for restock in restocks
+        ])
+    logger.info('Restock batch: %s product(s), %s unit(s) by %s',
+                len(deltas), sum(deltas.values()), request.user.username)
+
+    return Response({
+        'message': f'Restocked {len(deltas)} product(s)',
+        'restocked': [
+            {'product_id': pk, 'name': by_id[pk].name, 'quantity_added': quantity, 'stock': levels[pk]}
+            for pk, quantity in deltas.items()
+        ],
+    })
+
+
+# ─── Offline sale sync ──────────────────────────────────────────────────────
+
+MAX_SYNC_BATCH = 500
+SYNC_CHUNK_SIZE = 50
+
+@api_view(['POST'])
+@permission_classes([IsCashierOrManager])
+def sync_sales_batch(request):
+    """
+    Replay sales queued offline. Each sale must carry the client's offline_id;
+    ids already on the server are reported as duplicates instead of being
+    charged twice, so a terminal can safely retry a batch after a timeout.
+    Sales are committed SYNC_CHUNK_SIZE at a time, each in its own savepoint,
+    so one bad sale does not hold back the rest of the queue.
+    """
+    sales = request.data.get('sales')
+    if not isinstance(sales, list) or not sales:
+        return Response({'error': 'Provide a non-empty "sales" list'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(sales) > MAX_SYNC_BATCH:
+        return Response(
+            {'error': f'Too many sales. Maximum allowed is {MAX_SYNC_BATCH} per batch.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    offline_ids = [str(s.get('offline_id') or '').strip() if isinstance(s, dict) else '' for s in sales]
+    existing = dict(
+        SaleTransaction.objects.filter(offline_id__in=[o for o in offline_ids if o])
+        .values_list('offline_id', 'id')
+    )
+
+    results = [None] * len(sales)
+    pending, repeats, first_seen = [], [], {}
+    for index, (offline_id, sale) in enumerate(zip(offline_ids, sales)):
+        if not offline_id:
+            results[index] = {'offline_id': None, 'status': 'error', 'errors': {'offline_id': 'This field is required.'}}
+        elif offline_id in existing:
+            results[index] = {'offline_id': offline_id, 'status': 'duplicate', 'id': existing[offline_id]}
+        elif offline_id in first_seen:
+            repeats.append((index, first_seen[offline_id]))
+        else:
+            first_seen[offline_id] = index
+            pending.append((index, offline_id, sale))
+
+    def already_synced(offline_id):
+        # Another request synced this sale between our lookup and insert
+        return {
+            'offline_id': offline_id, 'status': 'duplicate',
+            'id': SaleTransaction.objects.filter(offline_id=offline_id).values_list('id', flat=True).first(),
+        }
+
+    for start in range(0, len(pending), SYNC_CHUNK_SIZE):
+        with db_transaction.atomic():
+            for index, offline_id, sale in pending[start:start + SYNC_CHUNK_SIZE]:
+                serializer = SaleTransactionSerializer(
+                    data={**sale, 'offline_id': offline_id}, context={'request': request}
+                )
+                try:
+                    serializer.is_valid(raise_exception=True)
+                    instance = serializer.save(cashier=request.user)
+                except ValidationError as e:
+                    if isinstance(e.detail, dict) and 'offline_id' in e.detail:
+                        results[index] = already_synced(offline_id)
+                    else:
+                        results[index] = {'offline_id': offline_id, 'status': 'error', 'errors': e.detail}
+                    continue
+                except IntegrityError:
+                    results[index] = already_synced(offline_id)
+                    continue
+                results[index] = {'offline_id': offline_id, 'status': 'created', 'id': instance.pk}
+
+    # A sale queued twice in the same batch is only charged once
+    for index, first in repeats:
+        first_result = results[first]
+        if first_result['status'] == 'error':
+            results[index] = dict(first_result)
+        else:
+            results[index] = {'offline_id': first_result['offline_id'], 'status': 'duplicate', 'id': first_result['id']}
+
+    counts = {'created': 0, 'duplicate': 0, 'error': 0}
+    for result in results:
+        counts[result['status']] += 1
+    logger.info('Offline sync by %s: %s created, %s duplicate, %s failed',
+                request.user.username, counts['created'], counts['duplicate'], counts['error'])
+
+    return Response({
+        'results': results,
+        'created': counts['created'],
+        'duplicates': counts['duplicate'],
+        'failed': counts['error'],
+    })
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsCashierOrManager])
 @throttle_classes([SustainedRateThrottle])
 def sales_report(request):
+    """
+    ?mode=summary (default): aggregates only — totals, daily summary and breakdowns.
+    ?mode=detail: the matching sales themselves, keyset-paginated newest first.
+    """
     start_date = request.GET.get("start_date")
     end_date = request.GET.get("end_date")
     cashier_id = request.GET.get("cashier_id")
     product_id = request.GET.get("product_id")
+    mode = request.GET.get("mode", "summary")
 
-    # Validate date parameters
-    if start_date:
-        try:
-            parse_date(start_date)
-        except ValueError:
-            return Response({"error": "Invalid start_date format"}, status=status.HTTP_400_BAD_REQUEST)
+    if mode not in ("summary", "detail"):
+        return Response({"error": "mode must be 'summary' or 'detail'"}, status=status.HTTP_400_BAD_REQUEST)
 
-    if end_date:
-        try:
-            parse_date(end_date)
-        except ValueError:
-            return Response({"error": "Invalid end_date format"}, status=status.HTTP_400_BAD_REQUEST)
+    # Validate date parameters
+    try:
+        start = parse_day(start_date)
+    except ValueError:
+        return Response({"error": "Invalid start_date format"}, status=status.HTTP_400_BAD_REQUEST)
 
-    sales = SaleTransaction.objects.all()
+    try:
+        end = parse_day(end_date)
+    except ValueError:
+        return Response({"error": "Invalid end_date format"}, status=status.HTTP_400_BAD_REQUEST)
 
     # If no cashier_id specified and user is cashier, show only their sales
-    if not cashier_id and (request.user.is_cashier and not request.user.is_manager and not request.user.is_admin):
-        sales = sales.filter(cashier=request.user)
-
-    if start_date:
-        sales = sales.filter(created_at__date__gte=parse_date(start_date))
-    if end_date:
-        sales = sales.filter(created_at__date__lte=parse_date(end_date))
-    if cashier_id:
-        sales = sales.filter(cashier__id=cashier_id)
-
-    if product_id:
-        sales = sales.filter(items__product__id=product_id).distinct()
-
-    sales_data = SaleTransactionSerializer(sales, many=True).data
-
-    # Daily Totals
-    daily_summary = (
-        sales.annotate(day=TruncDate("created_at"))
-        .values("day")
-        .annotate(total_sales=Count("id"), total_amount=Sum("total_amount"))
-        .order_by("day")
+    own_sales_only = not cashier_id and (request.user.is_cashier and not request.user.is_manager and not request.user.is_admin)
+    if own_sales_only:
+        cashier_id = request.user.id
+
+    if mode == "summary":
+        return Response(sales_report_data(start, end, cashier_id, product_id))
+
+    sales, _ = report_sales(cashier_id, product_id)
+    paginator = KeysetPagination()
+    page = paginator.paginate_queryset(
+        sales.filter(**date_range_filter('created_at', start, end)).select_related('cashier', 'customer').prefetch_related(
+            'items__product__category', BulkDiscount.active_prefetch('items__product__bulk_discounts'),
+        ),
+        request,
     )
+    return paginator.get_paginated_response(SaleTransactionSerializer(page, many=True).data)
 
-    return Response({
-        "sales": sales_data,
-        "daily_summary": daily_summary
-    })
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsCashierOrManager])
+@throttle_classes([SustainedRateThrottle])
+def export_sales(request):
+    """
+    Every line of the matching sales as a file download, streamed so any range
+    exports in constant memory. Same filters as sales_report, plus
+    ?type=csv (default) or xlsx. An XLSX of more than XLSX_SYNC_ROWS lines is
+    queued instead: the response is 202 with a report job to poll, whose
+    result is the file.
+    """
+    export_type = request.GET.get("type", "csv")
+    if export_type not in ("csv", "xlsx"):
+        return Response({"error": "type must be 'csv' or 'xlsx'"}, status=status.HTTP_400_BAD_REQUEST)
 
-def calculate_sales_stats(sales_queryset):
-    """Helper function to calculate sales statistics without code duplication"""
-    total_sales = sales_queryset.aggregate(total=Sum('total_amount'))['total'] or 0
-    transaction_count = sales_queryset.count()
-    average_sale = total_sales / transaction_count if transaction_count > 0 else 0
-    
-    return {
-        'total_sales': float(total_sales),
-        'transaction_count': transaction_count,
-        'average_sale': float(average_sale)
+    try:
+        start, end = parse_day(request.GET.get("start_date")), parse_day(request.GET.get("end_date"))
+    except ValueError:
+        return Response({"error": "Dates must be in YYYY-MM-DD format"}, status=status.HTTP_400_BAD_REQUEST)
+
+    cashier_id = request.GET.get("cashier_id")
+    if not cashier_id and request.user.is_cashier and not request.user.is_manager and not request.user.is_admin:
+        cashier_id = request.user.id
+
+    product_id = request.GET.get("product_id")
+    sales, _ = report_sales(cashier_id, product_id)
+    sales = sales.filter(**date_range_filter('created_at', start, end))
+    filename = f"sales_{start or 'start'}_{end or timezone.localdate()}.{export_type}"
+    if export_type == "csv":
+        return csv_response(sale_line_rows(sales), filename)
+
+    # The workbook is only sent once it is complete, so a long one is built off the request path
+    lines = SaleItem.objects.filter(transaction__in=sales.values('pk')).values('pk')[:XLSX_SYNC_ROWS + 1]
+    if lines.count() <= XLSX_SYNC_ROWS:
+        return xlsx_response(sale_line_rows(sales), filename)
+    params = {
+        'start_date': start.isoformat() if start else None,
+        'end_date': end.isoformat() if end else None,
+        'cashier_id': cashier_id or None,
+        'product_id': product_id or None,
     }
+    queued = ReportJob.objects.filter(
+        requested_by=request.user, kind=ReportJob.EXPORT, status__in=[ReportJob.PENDING, ReportJob.RUNNING],
+    ).defer('result')
+    job = next((job for job in queued if job.params == params), None)
+    if job is None:
+        job = ReportJob.objects.create(kind=ReportJob.EXPORT, params=params, requested_by=request.user)
+    return Response(ReportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
 
 
 @api_view(['GET'])
@@ -261,12 +570,8 @@ def calculate_sales_stats(sales_queryset):
 def store_today_sales(request):
     """Get TOTAL store sales for today - for dashboard card"""
     try:
-        today = timezone.now().date()
-        
         # Always get ALL sales for the store today
-        sales_today = SaleTransaction.objects.filter(created_at__date=today)
-        
-        stats = calculate_sales_stats(sales_today)
+        stats = store_today()
         stats['scope'] = 'store_total'
         
         return Response(stats)
@@ -286,15 +591,8 @@ def store_today_sales(request):
 def user_today_performance(request):
     """Get INDIVIDUAL user sales for today - for layout sidebar"""
     try:
-        today = timezone.now().date()
-        
-        # Get sales for today filtered by current user (everyone sees their own sales)
-        sales_today = SaleTransaction.objects.filter(
-            created_at__date=today,
-            cashier=request.user
-        )
-        
-        stats = calculate_sales_stats(sales_today)
+        # Everyone sees their own sales
+        stats = cashier_today(request.user.id)
         stats['scope'] = 'user_individual'
         
         return Response(stats)
@@ -376,7 +674,15 @@ class CustomerTransactionViewSet(viewsets.ReadOnlyModelViewSet):
     def get_queryset(self):
         customer_id = self.request.query_params.get('customer_id')
         if customer_id:
-            return CustomerTransaction.objects.filter(customer_id=customer_id).select_related('sale', 'customer').order_by('-created_at')
+            return (
+                CustomerTransaction.objects.filter(customer_id=customer_id)
+                .select_related('sale__cashier', 'sale__customer', 'customer')
+                .prefetch_related(
+                    'sale__items__product__category',
+                    BulkDiscount.active_prefetch('sale__items__product__bulk_discounts'),
+                )
+                .order_by('-created_at')
+            )
         return CustomerTransaction.objects.none()
 
 
@@ -424,7 +730,7 @@ def redeem_loyalty_points(request):
         return Response({"error": "Customer not found"}, status=status.HTTP_404_NOT_FOUND)
     
 
-class BulkDiscountViewSet(viewsets.ModelViewSet):
+class BulkDiscountViewSet(CatalogueChangeMixin, viewsets.ModelViewSet):
     queryset = BulkDiscount.objects.all()
     serializer_class = BulkDiscountSerializer
     permission_classes = [IsAuthenticated, IsManagerOrAdmin, make_tier_permission('bulk_discounts')]
@@ -433,7 +739,7 @@ class BulkDiscountViewSet(viewsets.ModelViewSet):
 
 # ─── Audit-aware viewsets ────────────────────────────────────────────────────
 
-class AuditedCategoryViewSet(AuditMixin, viewsets.ModelViewSet):
+class AuditedCategoryViewSet(CatalogueChangeMixin, AuditMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     pagination_class = None  # frontend needs full list for product forms
@@ -443,17 +749,27 @@ class AuditedCategoryViewSet(AuditMixin, viewsets.ModelViewSet):
             return [IsAuthenticated()]
         return [IsAuthenticated(), IsManagerOrAdmin()]
 
+    def list(self, request, *args, **kwargs):
+        return conditional_response(request, catalogue_etag(), lambda: super(AuditedCategoryViewSet, self).list(request, *args, **kwargs))
+
 
-class AuditedProductViewSet(AuditMixin, viewsets.ModelViewSet):
-    queryset = Product.objects.all().prefetch_related('bulk_discounts')
+class AuditedProductViewSet(CatalogueChangeMixin, AuditMixin, viewsets.ModelViewSet):
+    queryset = Product.objects.all()
     serializer_class = ProductSerializer
     pagination_class = None  # POS and products page need full list for client-side search
 
+    def get_queryset(self):
+        return catalogue_queryset()
+
     def get_permissions(self):
         if self.action in ('list', 'retrieve'):
             return [IsAuthenticated()]
         return [IsAuthenticated(), IsManagerOrAdmin()]
 
+    def list(self, request, *args, **kwargs):
+        etag = catalogue_etag()
+        return conditional_response(request, etag, lambda: catalogue_snapshot_response(request, etag))
+
     def destroy(self, request, *args, **kwargs):
         from django.db.models import ProtectedError
         instance = self.get_object()
@@ -478,7 +794,12 @@ class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
         action = self.request.query_params.get('action')
         user_id = self.request.query_params.get('user_id')
         if model:
-            qs = qs.filter(model_name__iexact=model)
+            # Exact match on the stored class name so (model_name, timestamp) is usable
+            try:
+                model = apps.get_model('core', model).__name__
+            except LookupError:
+                pass
+            qs = qs.filter(model_name=model)
         if action:
             qs = qs.filter(action=action.upper())
         if user_id:
@@ -486,15 +807,122 @@ class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
         return qs
 
 
+# ─── Catalogue change feed ───────────────────────────────────────────────────
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def catalogue_changes(request):
+    """
+    Products, categories and bulk discounts changed since ?since=<version>,
+    plus the ids deleted in that window. since=0 (or a cursor that is unknown
+    or pruned) returns the full catalogue with "full": true. Store the
+    returned version and send it back on the next poll.
+    """
+    try:
+        since = int(request.GET.get('since', 0))
+    except ValueError:
+        return Response({'error': 'since must be a whole number'}, status=status.HTTP_400_BAD_REQUEST)
+
+    full = since <= 0 or since > current_version() or since < oldest_version()
+    version = settled_version() if full else max(since, settled_version())
+
+    if full:
+        products = catalogue_queryset()
+        categories = Category.objects.all()
+        discounts = BulkDiscount.objects.all()
+        deleted = {'products': [], 'categories': [], 'bulk_discounts': []}
+    else:
+        changed = changed_ids_since(since)
+        products = list(catalogue_queryset().filter(pk__in=changed['Product']))
+        categories = list(Category.objects.filter(pk__in=changed['Category']))
+        discounts = list(BulkDiscount.objects.filter(pk__in=changed['BulkDiscount']))
+        deleted = {
+            'products': sorted(changed['Product'] - {p.pk for p in products}),
+            'categories': sorted(changed['Category'] - {c.pk for c in categories}),
+            'bulk_discounts': sorted(changed['BulkDiscount'] - {d.pk for d in discounts}),
+        }
+
+    return Response({
+        'version': version,
+        'full': full,
+        'products': ProductSerializer(products, many=True).data,
+        'categories': CategorySerializer(categories, many=True).data,
+        'bulk_discounts': BulkDiscountSerializer(discounts, many=True).data,
+        'deleted': deleted,
+    })
+
+
+# ─── Barcode lookup ─────────────────────────────────────────────────────────
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def product_by_barcode(request, code):
+    product = barcode_cache.lookup([code.strip()])[code.strip()]
+    if product is None:
+        return Response({'error': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(product)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def products_by_barcodes(request):
+    """Batch form for scanner bursts: {"barcodes": [...]} -> found products and unknown codes."""
+    barcodes = request.data.get('barcodes')
+    if not isinstance(barcodes, list) or not barcodes:
+        return Response({'error': 'Provide a non-empty "barcodes" list'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(barcodes) > MAX_BATCH_BARCODES:
+        return Response(
+            {'error': f'Too many barcodes. Maximum allowed is {MAX_BATCH_BARCODES} per request.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    codes = list(dict.fromkeys(str(b).strip() for b in barcodes if str(b).strip()))
+    results = barcode_cache.lookup(codes)
+    return Response({
+        'products': [results[c] for c in codes if results[c]],
+        'not_found': [c for c in codes if not results[c]],
+    })
+
+
+# ─── Stock ledger ────────────────────────────────────────────────────────────
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsManagerOrAdmin])
+@throttle_classes([SustainedRateThrottle])
+def stock_at_time(request):
+    """
+    Stock levels as of ?at= (ISO date or datetime, store-local if no offset),
+    from the nearest ledger snapshot plus the movements after it.
+    Optional ?product_id=1,2,3 limits the products returned.
+    """
+    at = parse_datetime(request.GET.get('at') or '')
+    if at is None:
+        return Response({'error': 'at must be an ISO date or datetime'}, status=status.HTTP_400_BAD_REQUEST)
+    if timezone.is_naive(at):
+        at = timezone.make_aware(at)
+
+    product_ids = None
+    if request.GET.get('product_id'):
+        try:
+            product_ids = [int(pk) for pk in request.GET['product_id'].split(',')]
+        except ValueError:
+            return Response({'error': 'product_id must be a comma-separated list of ids'}, status=status.HTTP_400_BAD_REQUEST)
+
+    levels = stock_at(at, product_ids)
+    products = Product.objects.filter(pk__in=levels).order_by('name').values_list('pk', 'name')
+    return Response({
+        'at': at,
+        'products': [{'id': pk, 'name': name, 'stock': levels[pk]} for pk, name in products],
+    })
+
+
 # ─── Low-stock alerts ────────────────────────────────────────────────────────
 
 LOW_STOCK_THRESHOLD = 10
 CRITICAL_STOCK_THRESHOLD = 5
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def low_stock_alerts(request):
-    low = Product.objects.filter(stock__lte=LOW_STOCK_THRESHOLD).order_by('stock')
+def low_stock_alert_rows():
+    low = Product.objects.filter(stock__lte=LOW_STOCK_THRESHOLD).select_related('category').order_by('stock')
     data = []
     for p in low:
         data.append({
@@ -505,9 +933,105 @@ def low_stock_alerts(request):
             'barcode': p.barcode,
             'category': p.category.name if p.category else None,
         })
+    return data
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def low_stock_alerts(request):
+    data = low_stock_alert_rows()
     return Response({'alerts': data, 'count': len(data)})
 
 
+# ─── Dashboard ───────────────────────────────────────────────────────────────
+
+DASHBOARD_SECTIONS = ('today', 'my_today', 'products', 'customers', 'recent_sales', 'top_products', 'low_stock_alerts')
+DASHBOARD_TOP_PRODUCTS_DAYS = 30
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@throttle_classes([SustainedRateThrottle])
+def dashboard(request):
+    """
+    Every dashboard card and list from server-side aggregates, in a handful of
+    queries. ?sections=a,b limits the response to the named sections (the
+    sidebar polls just my_today and low_stock_alerts).
+    """
+    requested = request.GET.get('sections')
+    sections = [x.strip() for x in requested.split(',') if x.strip()] if requested else list(DASHBOARD_SECTIONS)
+    unknown = [x for x in sections if x not in DASHBOARD_SECTIONS]
+    if unknown:
+        return Response(
+            {'error': f'Unknown section(s): {", ".join(unknown)}. Valid: {", ".join(DASHBOARD_SECTIONS)}'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    data = {}
+    today = timezone.localdate()
+
+    if 'today' in sections:
+        data['today'] = store_today()
+        yesterday = DailySalesRollup.objects.filter(day=today - timedelta(days=1)).aggregate(total=Sum('revenue'))
+        yesterday_total = float(yesterday['total'] or 0)
+        data['today']['yesterday_sales'] = yesterday_total
+        data['today']['change_pct'] = (
+            round((data['today']['total_sales'] - yesterday_total) / yesterday_total * 100, 1)
+            if yesterday_total else None
+        )
+
+    if 'my_today' in sections:
+        data['my_today'] = cashier_today(request.user.id)
+
+    if 'products' in sections:
+        data['products'] = Product.objects.aggregate(
+            total=Count('id'),
+            low_stock=Count('id', filter=Q(stock__lte=LOW_STOCK_THRESHOLD)),
+            critical_stock=Count('id', filter=Q(stock__lte=CRITICAL_STOCK_THRESHOLD)),
+            inventory_value=Sum(F('cost_price') * F('stock'), output_field=FloatField()),
+        )
+        data['products']['inventory_value'] = round(data['products']['inventory_value'] or 0, 2)
+
+    if 'customers' in sections:
+        # Customer records belong to the loyalty feature; lower tiers get null
+        data['customers'] = (
+            {'total': Customer.objects.count()} if plan_has_feature('customer_loyalty') else None
+        )
+
+    if 'recent_sales' in sections:
+        recent = (
+            SaleTransaction.objects.select_related('cashier', 'customer')
+            .annotate(item_count=Count('items'), units=Coalesce(Sum('items__quantity'), 0))
+            .order_by('-created_at', '-id')[:5]
+        )
+        data['recent_sales'] = SaleTransactionListSerializer(recent, many=True).data
+
+    if 'top_products' in sections:
+        since = today - timedelta(days=DASHBOARD_TOP_PRODUCTS_DAYS - 1)
+        top = list(
+            SaleItem.objects.filter(**date_range_filter('transaction__created_at', since))
+            .values('product_id')
+            .annotate(name=Max('product_name'), units_sold=Sum('quantity'))
+            .order_by('-units_sold')[:5]
+        )
+        stock = dict(Product.objects.filter(pk__in=[t['product_id'] for t in top]).values_list('pk', 'stock'))
+        data['top_products'] = [
+            {
+                'id': t['product_id'],
+                'name': t['name'],
+                'units_sold': t['units_sold'],
+                'stock': stock.get(t['product_id'], 0),
+                'is_low_stock': stock.get(t['product_id'], 0) <= LOW_STOCK_THRESHOLD,
+            }
+            for t in top
+        ]
+
+    if 'low_stock_alerts' in sections:
+        data['low_stock_alerts'] = low_stock_alert_rows()
+
+    return Response(data)
+
+
 # ─── Bulk Excel upload ───────────────────────────────────────────────────────
 
 TEMPLATE_HEADERS = [
@@ -557,7 +1081,7 @@ def download_product_template(request):
         ('HOW TO USE', ''),
         ('1.', 'Go to the "Products" sheet and fill in your products starting from row 2.'),
         ('2.', 'Do NOT modify or delete row 1 (the blue header row).'),
-        ('3.', 'Save the file and upload it using the "Upload Excel" button.'),
+        ('3.', 'Save the file (as .xlsx, or as UTF-8 CSV) and upload it using the "Upload File" button.'),
         ('', ''),
         ('COLUMN GUIDE', ''),
         ('name *', 'Required. Product name (e.g. Coca Cola 50cl)'),
@@ -573,8 +1097,13 @@ def download_product_template(request):
         ('', ''),
         ('NOTES', ''),
         ('Re-uploading', 'If a barcode already exists, the product is UPDATED not duplicated.'),
-        ('Errors', 'If any row has an error the entire upload is cancelled — nothing is saved.'),
-        ('Max rows', f'Maximum {MAX_UPLOAD_ROWS} products per upload. Max file size 5 MB.'),
+        ('Errors', f'Each row with an error is reported with its row number and the reason (the first {MAX_REPORTED_ERRORS} for large files). '
+                   f'A file of up to {MAX_UPLOAD_ROWS} rows is saved all or nothing: fix the reported rows and upload again.'),
+        ('Large files', f'Files over {MAX_UPLOAD_ROWS} rows are imported in the background, {CHUNK_ROWS} rows at a time, with progress shown. '
+                        'The Products page previews them first and imports them once no row has an error. '
+                        'Background imports started through the API save the valid rows and report the rest, unless started as all or nothing.'),
+        ('Max size', f'{MAX_UPLOAD_ROWS} rows or {MAX_UPLOAD_BYTES // (1024 * 1024)} MB to import straight away; '
+                     f'up to {MAX_BACKGROUND_UPLOAD_BYTES // (1024 * 1024)} MB in the background.'),
     ]
 
     for r, (label, value) in enumerate(instructions, start=2):
@@ -587,6 +1116,8 @@ def download_product_template(request):
             wi.cell(row=r, column=1).fill = green_fill
         if label == 'Errors':
             wi.cell(row=r, column=1).fill = red_fill
+        if label in ('Errors', 'Large files', 'Max size'):
+            wi.cell(row=r, column=2).alignment = Alignment(wrap_text=True)
 
     wi.column_dimensions['A'].width = 22
     wi.column_dimensions['B'].width = 70
@@ -602,12 +1133,35 @@ def download_product_template(request):
     return response
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsManagerOrAdmin])
+def export_products(request):
+    """The whole catalogue as a CSV in the upload template's columns, so it can be edited and re-uploaded."""
+    block = tier_block_response('bulk_upload')
+    if block:
+        return Response(block, status=status.HTTP_403_FORBIDDEN)
+    return csv_response(product_rows(), 'products.csv', TEMPLATE_HEADERS)
+
+
 MAX_UPLOAD_BYTES = 5 * 1024 * 1024  # 5 MB
 MAX_UPLOAD_ROWS = 1000
+# Background imports are read in chunks, so only storage bounds their size
+MAX_BACKGROUND_UPLOAD_BYTES = 100 * 1024 * 1024
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated, IsManagerOrAdmin])
 def bulk_upload_products(request):
+    """
+    Import products from an Excel sheet or a CSV file with the template's
+    columns. Up to MAX_UPLOAD_ROWS rows are
+    imported within the request, all or nothing. With mode=background the
+    file is queued as a ProductImportJob instead (202; poll
+    products/import-jobs/<id>/), and atomic=true keeps it all or nothing.
+    With dry_run=true nothing is written; the response says how many
+    products would be created, updated and left unchanged, with a per-field
+    diff of every update. A background dry run puts that preview on the job,
+    and products/import-jobs/<id>/commit/ then imports the same file.
+    """
     block = tier_block_response('bulk_upload')
     if block:
         return Response(block, status=status.HTTP_403_FORBIDDEN)
@@ -615,8 +1169,22 @@ def bulk_upload_products(request):
     if not file:
         return Response({'error': 'No file provided'}, status=status.HTTP_400_BAD_REQUEST)
 
-    if not file.name.endswith(('.xlsx', '.xls')):
-        return Response({'error': 'File must be an Excel file (.xlsx or .xls)'}, status=status.HTTP_400_BAD_REQUEST)
+    if not file.name.lower().endswith(('.xlsx', '.xls', '.csv')):
+        return Response({'error': 'File must be an Excel file (.xlsx or .xls) or a CSV file'}, status=status.HTTP_400_BAD_REQUEST)
+
+    dry_run = str(request.data.get('dry_run', '')).lower() in ('true', '1', 'yes')
+    if request.data.get('mode') == 'background':
+        if file.size > MAX_BACKGROUND_UPLOAD_BYTES:
+            return Response({'error': 'File too large. Maximum allowed size is 100 MB.'}, status=status.HTTP_400_BAD_REQUEST)
+        with db_transaction.atomic():
+            job = ProductImportJob.objects.create(
+                filename=file.name[:255],
+                atomic=str(request.data.get('atomic', '')).lower() in ('true', '1', 'yes'),
+                dry_run=dry_run,
+                requested_by=request.user,
+            )
+            store_upload(job, file)
+        return Response(ProductImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
 
     # Fix 2: reject oversized files before loading into memory
     if file.size > MAX_UPLOAD_BYTES:
@@ -625,80 +1193,33 @@ def bulk_upload_products(request):
             status=status.HTTP_400_BAD_REQUEST
         )
 
+    # Rows are read lazily; stop one past the cap so an oversized sheet is never held
     try:
-        wb = openpyxl.load_workbook(file, data_only=True, read_only=True)
-    except Exception:
-        return Response({'error': 'Could not read Excel file. Make sure it is a valid .xlsx file.'}, status=status.HTTP_400_BAD_REQUEST)
+        data_rows = list(islice(reader_for(file.name)(file), MAX_UPLOAD_ROWS + 1))
+    except SheetError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-    ws = wb.active
-    rows = list(ws.iter_rows(values_only=True))
-    wb.close()
-
-    if len(rows) < 2:
+    if not data_rows:
         return Response({'error': 'File is empty or only has a header row'}, status=status.HTTP_400_BAD_REQUEST)
 
-    header_row = [str(h).strip().lower() if h else '' for h in rows[0]]
-    required = {'name', 'price', 'cost_price', 'stock', 'barcode'}
-    if not required.issubset(set(header_row)):
-        return Response({
-            'error': f'Missing required columns. Expected: {", ".join(required)}. Got: {", ".join(h for h in header_row if h)}'
-        }, status=status.HTTP_400_BAD_REQUEST)
-
-    # Fix 3: skip header only — any row where name is blank is silently ignored,
-    # no fragile hints-row detection needed
-    data_rows = [(i + 2, row) for i, row in enumerate(rows[1:])
-                 if str(row[header_row.index('name')] if 'name' in header_row else '').strip()]
-
     # Fix 2: enforce row cap after stripping blanks
     if len(data_rows) > MAX_UPLOAD_ROWS:
         return Response(
-            {'error': f'Too many rows. Maximum allowed is {MAX_UPLOAD_ROWS} products per upload.'},
+            {
+                'error': f'Too many rows. Maximum allowed is {MAX_UPLOAD_ROWS} products per upload; import larger sheets in the background.',
+                'code': 'too_many_rows',
+            },
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    def col(row_data, name):
-        try:
-            return row_data[header_row.index(name)]
-        except (ValueError, IndexError):
-            return None
-
-    created, updated, errors = 0, 0, []
-
     # Fix 1: validate everything first, then write atomically
-    validated = []
-    for row_num, row in data_rows:
-        name = str(col(row, 'name') or '').strip()
-        try:
-            price = float(col(row, 'price') or 0)
-            cost_price = float(col(row, 'cost_price') or 0)
-            stock = int(float(col(row, 'stock') or 0))
-            barcode = str(col(row, 'barcode') or '').strip()
-            category_name = str(col(row, 'category_name') or '').strip()
-            unit_of_measure = str(col(row, 'unit_of_measure') or 'units').strip()
-            is_bulk_raw = str(col(row, 'is_bulk_product') or 'false').strip().lower()
-            is_bulk = is_bulk_raw in ('true', '1', 'yes')
-            bulk_quantity = int(float(col(row, 'bulk_quantity') or 1))
-            bulk_price_raw = col(row, 'bulk_price')
-            bulk_price = float(bulk_price_raw) if bulk_price_raw not in (None, '', 'none') else None
-
-            if price <= 0:
-                errors.append({'row': row_num, 'name': name, 'error': 'Price must be positive'})
-                continue
-            if cost_price < 0:
-                errors.append({'row': row_num, 'name': name, 'error': 'Cost price cannot be negative'})
-                continue
-            if not barcode:
-                errors.append({'row': row_num, 'name': name, 'error': 'Barcode is required'})
-                continue
-
-            validated.append({
-                'row_num': row_num, 'name': name, 'barcode': barcode,
-                'category_name': category_name, 'price': price, 'cost_price': cost_price,
-                'stock': stock, 'unit_of_measure': unit_of_measure,
-                'is_bulk': is_bulk, 'bulk_quantity': bulk_quantity, 'bulk_price': bulk_price,
-            })
-        except Exception as e:
-            errors.append({'row': row_num, 'name': name, 'error': str(e)})
+    validated, errors = [], []
+    for row_num, values in data_rows:
+        row, error = validate_row(row_num, values)
+        if row:
+            validated.append(row)
+        else:
+            errors.append(error)
 
     # If any row failed validation, return errors without touching the database
     if errors:
@@ -710,49 +1231,57 @@ def bulk_upload_products(request):
             'message': 'No products were saved. Fix the errors and re-upload.',
         }, status=status.HTTP_400_BAD_REQUEST)
 
+    if dry_run:
+        return Response(preview_import(validated))
+
     # Fix 1: all rows valid — write everything in one atomic transaction
-    from django.db import transaction as db_transaction
-    with db_transaction.atomic():
-        for item in validated:
-            category = None
-            if item['category_name']:
-                category, _ = Category.objects.get_or_create(name=item['category_name'])
-
-            product, was_created = Product.objects.update_or_create(
-                barcode=item['barcode'],
-                defaults={
-                    'name': item['name'],
-                    'category': category,
-                    'price': item['price'],
-                    'cost_price': item['cost_price'],
-                    'stock': item['stock'],
-                    'unit_of_measure': item['unit_of_measure'],
-                    'is_bulk_product': item['is_bulk'],
-                    'bulk_quantity': item['bulk_quantity'] if item['is_bulk'] else 1,
-                    'bulk_price': item['bulk_price'] if item['is_bulk'] else None,
-                }
-            )
-            AuditLog.objects.create(
-                action='CREATE' if was_created else 'UPDATE',
-                model_name='Product',
-                object_id=str(product.pk),
-                object_repr=str(product)[:200],
-                changed_by=request.user,
-                changes={'source': 'bulk_upload'},
-            )
-            if was_created:
-                created += 1
-            else:
-                updated += 1
+    try:
+        created, updated, unchanged = import_products(validated, request.user)
+    except IntegrityError:
+        # Another upload or edit added one of these barcodes since they were read
+        return Response({'error': 'Products changed during the upload. Please try again.'}, status=status.HTTP_409_CONFLICT)
 
     return Response({
         'created': created,
         'updated': updated,
+        'unchanged': unchanged,
         'errors': [],
-        'total_processed': created + updated,
+        'total_processed': created + updated + unchanged,
     })
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsManagerOrAdmin])
+def product_import_status(request, pk):
+    """Progress of a background import; poll until status is DONE or FAILED."""
+    block = tier_block_response('bulk_upload')
+    if block:
+        return Response(block, status=status.HTTP_403_FORBIDDEN)
+    job = ProductImportJob.objects.filter(pk=pk, requested_by=request.user).first()
+    if job is None:
+        return Response({'error': 'Import not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(ProductImportJobSerializer(job).data)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, IsManagerOrAdmin])
+def commit_product_import(request, pk):
+    """Import the file of a finished background dry run, all or nothing (202; poll as before)."""
+    block = tier_block_response('bulk_upload')
+    if block:
+        return Response(block, status=status.HTTP_403_FORBIDDEN)
+    job = ProductImportJob.objects.filter(pk=pk, requested_by=request.user).first()
+    if job is None:
+        return Response({'error': 'Import not found'}, status=status.HTTP_404_NOT_FOUND)
+    if not commit_preview(job):
+        return Response(
+            {'error': 'Only a finished preview without row errors can be imported'},
+            status=status.HTTP_409_CONFLICT,
+        )
+    job.refresh_from_db()
+    return Response(ProductImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
 # ─── Margin / cost analytics report ─────────────────────────────────────────
 
 @api_view(['GET'])
@@ -765,72 +1294,94 @@ def margin_report(request):
     end_date = request.GET.get('end_date')
     cashier_id = request.GET.get('cashier_id')
 
-    sales = SaleTransaction.objects.all()
-    if start_date:
-        sales = sales.filter(created_at__date__gte=parse_date(start_date))
-    if end_date:
-        sales = sales.filter(created_at__date__lte=parse_date(end_date))
-    if cashier_id:
-        sales = sales.filter(cashier__id=cashier_id)
-
-    sale_ids = sales.values_list('id', flat=True)
-    items = SaleItem.objects.filter(transaction__in=sale_ids).select_related('product')
-
-    # Per-product aggregation
-    product_stats = {}
-    for item in items:
-        pid = item.product.id
-        if pid not in product_stats:
-            product_stats[pid] = {
-                'id': pid,
-                'name': item.product.name,
-                'category': item.product.category.name if item.product.category else 'Uncategorized',
-                'revenue': 0.0,
-                'cost': 0.0,
-                'units_sold': 0,
-            }
-        qty = item.quantity
-        revenue = float(item.price_at_sale) * qty
-        cost = float(item.product.cost_price) * qty
-        product_stats[pid]['revenue'] += revenue
-        product_stats[pid]['cost'] += cost
-        product_stats[pid]['units_sold'] += qty
-
-    for p in product_stats.values():
-        p['gross_profit'] = round(p['revenue'] - p['cost'], 2)
-        p['margin_pct'] = round((p['gross_profit'] / p['revenue'] * 100) if p['revenue'] else 0, 2)
-        p['revenue'] = round(p['revenue'], 2)
-        p['cost'] = round(p['cost'], 2)
-
-    # Per-day aggregation
-    daily_stats = {}
-    for item in items:
-        day = item.transaction.created_at.date().isoformat()
-        if day not in daily_stats:
-            daily_stats[day] = {'date': day, 'revenue': 0.0, 'cost': 0.0}
-        daily_stats[day]['revenue'] += float(item.price_at_sale) * item.quantity
-        daily_stats[day]['cost'] += float(item.product.cost_price) * item.quantity
-
-    for d in daily_stats.values():
-        d['gross_profit'] = round(d['revenue'] - d['cost'], 2)
-        d['margin_pct'] = round((d['gross_profit'] / d['revenue'] * 100) if d['revenue'] else 0, 2)
-        d['revenue'] = round(d['revenue'], 2)
-        d['cost'] = round(d['cost'], 2)
-
-    total_revenue = sum(p['revenue'] for p in product_stats.values())
-    total_cost = sum(p['cost'] for p in product_stats.values())
-    total_profit = total_revenue - total_cost
+    try:
+        start, end = parse_day(start_date), parse_day(end_date)
+    except ValueError:
+        return Response({'error': 'Dates must be in YYYY-MM-DD format'}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(margin_report_data(start, end, cashier_id))
 
-    return Response({
-        'summary': {
-            'total_revenue': round(total_revenue, 2),
-            'total_cost': round(total_cost, 2),
-            'gross_profit': round(total_profit, 2),
-            'margin_pct': round((total_profit / total_revenue * 100) if total_revenue else 0, 2),
-        },
-        'by_product': sorted(product_stats.values(), key=lambda x: x['gross_profit'], reverse=True),
-        'by_day': sorted(daily_stats.values(), key=lambda x: x['date']),
-    })
+
+# ─── Background report jobs ──────────────────────────────────────────────────
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, IsCashierOrManager])
+@throttle_classes([SustainedRateThrottle])
+def submit_report_job(request):
+    """
+    Queue a sales or margin report for the run_jobs worker. Takes the same
+    filters as the matching report endpoint; returns 202 with the job to poll.
+    """
+    kind = request.data.get('kind')
+    if kind not in (ReportJob.SALES, ReportJob.MARGIN):
+        return Response({'error': "kind must be 'sales' or 'margin'"}, status=status.HTTP_400_BAD_REQUEST)
+
+    user = request.user
+    if kind == ReportJob.MARGIN:
+        if not (user.is_manager or user.is_admin):
+            return Response({'error': 'Only managers can run margin reports'}, status=status.HTTP_403_FORBIDDEN)
+        block = tier_block_response('margin_analytics')
+        if block:
+            return Response(block, status=status.HTTP_403_FORBIDDEN)
+
+    params = {}
+    for field in ('start_date', 'end_date'):
+        try:
+            day = parse_day(request.data.get(field))
+        except (TypeError, ValueError):
+            return Response({'error': f'{field} must be in YYYY-MM-DD format'}, status=status.HTTP_400_BAD_REQUEST)
+        params[field] = day.isoformat() if day else None
+    fields = ('cashier_id', 'product_id') if kind == ReportJob.SALES else ('cashier_id',)
+    for field in fields:
+        value = request.data.get(field)
+        if value in (None, ''):
+            params[field] = None
+        elif str(value).isdigit():
+            params[field] = int(value)
+        else:
+            return Response({'error': f'{field} must be an id'}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Same scoping as sales_report: cashiers see only their own sales by default
+    if kind == ReportJob.SALES and not params['cashier_id'] and not (user.is_manager or user.is_admin):
+        params['cashier_id'] = user.id
+
+    # Resubmitting while the same report is still queued joins the existing job
+    queued = ReportJob.objects.filter(
+        requested_by=user, kind=kind, status__in=[ReportJob.PENDING, ReportJob.RUNNING],
+    ).defer('result')
+    job = next((job for job in queued if job.params == params), None)
+    if job is None:
+        job = ReportJob.objects.create(kind=kind, params=params, requested_by=user)
+    return Response(ReportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsCashierOrManager])
+def report_job_status(request, pk):
+    """Poll a job until status is DONE or FAILED."""
+    job = ReportJob.objects.filter(pk=pk, requested_by=request.user).defer('result').first()
+    if job is None:
+        return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(ReportJobSerializer(job).data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsCashierOrManager])
+@throttle_classes([SustainedRateThrottle])
+def report_job_result(request, pk):
+    """
+    The finished report, shaped exactly like the synchronous endpoint's
+    response. An export job's result is its file.
+    """
+    job = ReportJob.objects.filter(pk=pk, requested_by=request.user).first()
+    if job is None:
+        return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+    if job.status != ReportJob.DONE:
+        return Response({'error': job.error or 'Job has not finished', 'status': job.status},
+                        status=status.HTTP_409_CONFLICT)
+    if job.kind == ReportJob.EXPORT:
+        return stored_file_response(job, job.result['filename'])
+    return Response(job.result)
 
 
 # ─── Store Settings ───────────────────────────────────────────────────────────
@@ -920,11 +1471,14 @@ def delete_staff(request, pk):
 @api_view(['GET'])
 @permission_classes([])
 def get_store_settings(request):
-    response = Response(StoreSettingsSerializer(StoreSettings.load()).data)
-    # Prevent browsers and CDNs from caching this — plan_tier must always be fresh
-    response['Cache-Control'] = 'no-store, no-cache, must-revalidate'
-    response['Pragma'] = 'no-cache'
-    return response
+    obj = StoreSettings.load()
+    # no-cache (not no-store): clients must revalidate on every load so a
+    # plan_tier change is seen immediately, but an unchanged record is a 304
+    return conditional_response(
+        request, f'"settings-{obj.version}"',
+        lambda: Response(StoreSettingsSerializer(obj).data),
+        cache_control='no-cache',
+    )
 
 
 @api_view(['PATCH'])
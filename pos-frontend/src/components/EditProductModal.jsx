@@ -15,7 +15,9 @@ import {
         id: product?.id,
         name: product?.name || "",
         price: product?.price || "",
-        stock: product?.stock || "",
+        stock: product?.stock ?? "",
+        // Lets the server apply a stock edit as a change, not overwrite sales made meanwhile
+        expected_stock: product?.stock ?? 0,
         cost_price: product?.cost_price || "",
         barcode: product?.barcode || "",
         category_id: product?.category?.id || product?.category_id || "",
@@ -59,71 +59,40 @@ const Layout = ({ children }) => {
   });
   const [loading, setLoading] = useState(false);
 
-  // Fetch today's performance stats
-  const fetchTodayStats = async () => {
+  // Today's performance and low-stock alerts, in one request
+  const fetchSidebarData = async () => {
     if (!user) return;
     
     setLoading(true);
     try {
-      const response = await axiosInstance.get('/user-today-performance/');
+      const response = await axiosInstance.get('/dashboard/', {
+        params: { sections: 'my_today,low_stock_alerts' },
+      });
       const data = response.data;
       
       setTodayStats({
-        sales: data.total_sales || 0,
-        transactions: data.transaction_count || 0,
-        averageSale: data.average_sale || 0
+        sales: data.my_today.total_sales || 0,
+        transactions: data.my_today.transaction_count || 0,
+        averageSale: data.my_today.average_sale || 0
       });
+      setLowStockAlerts(data.low_stock_alerts || []);
     } catch (error) {
       console.error('Failed to fetch today stats:', error);
-      // Fallback: try the old endpoint
-      try {
-        const today = new Date().toISOString().split('T')[0];
-        const response = await axiosInstance.get(`/sales-report/?start_date=${today}&end_date=${today}`);
-        
-        const salesData = response.data.sales || [];
-        const totalSales = salesData.reduce((sum, sale) => sum + parseFloat(sale.total_amount || 0), 0);
-        const transactionCount = salesData.length;
-        const averageSale = transactionCount > 0 ? totalSales / transactionCount : 0;
-
-        setTodayStats({
-          sales: totalSales,
-          transactions: transactionCount,
-          averageSale: averageSale
-        });
-      } catch (fallbackError) {
-        console.error('Fallback also failed:', fallbackError);
-      }
     } finally {
       setLoading(false);
     }
   };
 
-  const fetchLowStockAlerts = async () => {
-    if (!user) return;
-    try {
-      const res = await axiosInstance.get('/low-stock-alerts/');
-      setLowStockAlerts(res.data.alerts || []);
-    } catch {
-      // silently ignore
-    }
-  };
-
   // Poll for updates every 30 seconds
   useEffect(() => {
-    fetchTodayStats();
-    const interval = setInterval(fetchTodayStats, 30000);
-    return () => clearInterval(interval);
-  }, [user]);
-
-  useEffect(() => {
-    fetchLowStockAlerts();
-    const interval = setInterval(fetchLowStockAlerts, 60000);
+    fetchSidebarData();
+    const interval = setInterval(fetchSidebarData, 30000);
     return () => clearInterval(interval);
   }, [user]);
 
   // Also update stats when route changes (after sales)
   useEffect(() => {
-    fetchTodayStats();
+    fetchSidebarData();
   }, [location.pathname]);
 
   const handleDrawerToggle = () => {
@@ -309,7 +278,7 @@ const Layout = ({ children }) => {
           </Typography>
           <IconButton 
             size="small" 
-            onClick={fetchTodayStats}
+            onClick={fetchSidebarData}
             disabled={loading}
             sx={{ color: 'white', opacity: 0.8 }}
           >
@@ -3,6 +3,15 @@ import axiosInstance from '../utils/axiosInstance';
 
 const OfflineContext = createContext();
 
+// offline_id is the server-wide idempotency key for /sales/batch/, so it must
+// never repeat across terminals. randomUUID needs a secure context; plain-HTTP
+// installs fall back to getRandomValues, which is available everywhere.
+const newOfflineId = () => {
+  if (crypto.randomUUID) return `offline_${crypto.randomUUID()}`;
+  const bytes = crypto.getRandomValues(new Uint8Array(16));
+  return `offline_${Array.from(bytes, b => b.toString(16).padStart(2, '0')).join('')}`;
+};
+
 export const OfflineProvider = ({ children }) => {
   const [isOnline, setIsOnline] = useState(navigator.onLine);
   const [pendingSales, setPendingSales] = useState([]);
@@ -33,7 +42,7 @@ export const OfflineProvider = ({ children }) => {
 
   const saveOfflineSale = (saleData) => {
     const offlineSale = {
-      id: `offline_${Date.now()}`,
+      id: newOfflineId(),
       data: saleData,
       timestamp: new Date().toLocaleString(),
       synced: false
@@ -51,13 +60,25 @@ export const OfflineProvider = ({ children }) => {
     if (pending.length === 0) return 0;
 
     const successful = [];
-    
-    for (const sale of pending) {
+    const BATCH_SIZE = 200;
+
+    // The server dedupes on offline_id, so a batch that timed out after it
+    // was committed can be resent without double-charging stock.
+    for (let i = 0; i < pending.length; i += BATCH_SIZE) {
+      const batch = pending.slice(i, i + BATCH_SIZE);
       try {
-        await axiosInstance.post('/sales/', sale.data);
-        successful.push(sale.id);
+        const response = await axiosInstance.post('/sales/batch/', {
+          sales: batch.map(sale => ({ ...sale.data, offline_id: sale.id })),
+        });
+        response.data.results.forEach(result => {
+          if (result.status === 'created' || result.status === 'duplicate') {
+            successful.push(result.offline_id);
+          } else {
+            console.error('Failed to sync sale:', result.offline_id, result.errors);
+          }
+        });
       } catch (error) {
-        console.error('Failed to sync sale:', error);
+        console.error('Failed to sync sales batch:', error);
       }
     }
 
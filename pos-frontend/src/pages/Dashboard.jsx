@@ -142,6 +142,8 @@ const Dashboard = () => {
   const { user } = useContext(AuthContext);
   const [stats, setStats] = useState({
     todaySales: 0,
+    todayTransactions: 0,
+    salesChangePct: undefined,
     totalProducts: 0,
     lowStockItems: 0,
     totalCustomers: 0,
@@ -165,57 +167,36 @@ const Dashboard = () => {
       setLoading(true);
       setError(null);
 
-      const storeSalesResponse = await axiosInstance.get('/store-today-sales/');
-      const storeData = storeSalesResponse.data;
+      const { data } = await axiosInstance.get('/dashboard/');
 
-      const [productsResponse, customersResponse, salesResponse] = await Promise.all([
-        axiosInstance.get('/products/'),
-        axiosInstance.get('/customers/').catch(() => ({ data: [] })),
-        axiosInstance.get('/sales/'),
-      ]);
-
-      const products = productsResponse.data;
-      const customers = customersResponse.data;
-      const sales = salesResponse.data;
-
-      const lowStockItems    = products.filter(p => parseInt(p.stock || 0) <= 10).length;
-      const criticalStockItems = products.filter(p => parseInt(p.stock || 0) <= 5).length;
-      const inventoryValue   = products.reduce((s, p) => s + parseFloat(p.cost_price || 0) * parseInt(p.stock || 0), 0);
-
-      const recentSales = sales.slice(0, 5).map(sale => ({
+      const recentSales = data.recent_sales.map(sale => ({
         id: sale.id,
         amount: parseFloat(sale.total_amount || 0),
-        items: sale.items?.length || 0,
+        items: sale.item_count || 0,
         time: formatTimeAgo(sale.created_at),
         customer: sale.customer_name,
         cashier: sale.cashier,
       }));
 
-      const productSales = {};
-      sales.forEach(sale => {
-        sale.items?.forEach(item => {
-          const id   = item.product?.id || item.product_id;
-          const name = item.product?.name || 'Unknown';
-          if (!productSales[id]) {
-            const prod = products.find(p => p.id === id);
-            productSales[id] = { name, sales: 0, stock: prod?.stock || 0, isLowStock: parseInt(prod?.stock || 0) <= 10 };
-          }
-          productSales[id].sales += parseInt(item.quantity || 0);
-        });
-      });
-
-      const topProducts = Object.values(productSales).sort((a, b) => b.sales - a.sales).slice(0, 5);
+      const topProducts = data.top_products.map(p => ({
+        name: p.name,
+        sales: p.units_sold,
+        stock: p.stock,
+        isLowStock: p.is_low_stock,
+      }));
       const pendingSales = JSON.parse(localStorage.getItem('holo_pending_sales') || '[]');
 
       setStats({
-        todaySales: storeData.total_sales || 0,
-        totalProducts: products.length,
-        lowStockItems,
-        criticalStockItems,
-        totalCustomers: customers.length,
+        todaySales: data.today.total_sales || 0,
+        todayTransactions: data.today.transaction_count || 0,
+        salesChangePct: data.today.change_pct ?? undefined,
+        totalProducts: data.products.total,
+        lowStockItems: data.products.low_stock,
+        criticalStockItems: data.products.critical_stock,
+        totalCustomers: data.customers?.total ?? 0,
         recentSales,
         topProducts,
-        inventoryValue,
+        inventoryValue: data.products.inventory_value,
         pendingOfflineSales: pendingSales.length,
       });
     } catch (err) {
@@ -283,10 +264,10 @@ const Dashboard = () => {
           <StatCard
             title="Store Sales Today"
             value={loading ? '—' : formatCurrency(stats.todaySales)}
-            subtitle={`${stats.recentSales.length} transactions`}
+            subtitle={`${stats.todayTransactions} transactions`}
             icon={<AttachMoneyIcon />}
             gradient={G.brand}
-            trend={12.5}
+            trend={stats.salesChangePct}
             loading={loading}
             onClick={() => navigate('/reports/sales')}
           />
@@ -298,7 +279,6 @@ const Dashboard = () => {
             subtitle={stats.lowStockItems > 0 ? `${stats.lowStockItems} need restocking` : 'All well-stocked'}
             icon={<InventoryIcon />}
             gradient={G.sky}
-            trend={2.1}
             loading={loading}
             onClick={() => navigate('/products')}
           />
@@ -320,7 +300,6 @@ const Dashboard = () => {
             subtitle="Registered loyalty members"
             icon={<PeopleIcon />}
             gradient={G.amber}
-            trend={5.2}
             loading={loading}
             onClick={() => navigate('/customers')}
           />
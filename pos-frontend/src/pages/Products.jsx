@@ -73,6 +73,8 @@ function ProductsPage() {
   const [uploadDialogOpen, setUploadDialogOpen] = useState(false);
   const [uploading, setUploading] = useState(false);
   const [uploadResults, setUploadResults] = useState(null);
+  const [uploadProgress, setUploadProgress] = useState(null);
+  const [uploadPreview, setUploadPreview] = useState(null);
   const fileInputRef = useRef(null);
   const [page, setPage] = useState(0);
   const [rowsPerPage, setRowsPerPage] = useState(10);
@@ -150,28 +152,123 @@ function ProductsPage() {
     }
   };
 
-  const handleFileUpload = async (e) => {
-    const file = e.target.files[0];
-    if (!file) return;
-    e.target.value = '';
+  // Sheets over the synchronous row cap are previewed and imported by the
+  // background worker; poll the job until it finishes, showing rows read
+  const waitForImport = async (jobId) => {
+    for (;;) {
+      await new Promise(resolve => setTimeout(resolve, 2000));
+      const { data: job } = await axiosInstance.get(`products/import-jobs/${jobId}/`);
+      setUploadProgress(job.rows_read);
+      if (job.status === 'DONE' || job.status === 'FAILED') return job;
+    }
+  };
+
+  const handleExportCsv = async () => {
+    try {
+      const response = await axiosInstance.get('products/export/', { responseType: 'blob' });
+      const url = URL.createObjectURL(new Blob([response.data], { type: 'text/csv' }));
+      const a = document.createElement('a');
+      a.href = url;
+      a.download = 'products.csv';
+      a.click();
+      URL.revokeObjectURL(url);
+    } catch {
+      showSnackbar('Failed to export products', 'error');
+    }
+  };
+
+  const postUpload = (file, fields = {}) => {
+    const formData = new FormData();
+    formData.append('file', file);
+    Object.entries(fields).forEach(([key, value]) => formData.append(key, value));
+    return axiosInstance.post('products/bulk-upload/', formData, {
+      headers: { 'Content-Type': 'multipart/form-data' },
+    });
+  };
+
+  // Runs an upload step with the dialog's spinner, showing its outcome or error
+  const runUpload = async (step) => {
     setUploading(true);
     setUploadResults(null);
+    setUploadProgress(null);
     setUploadDialogOpen(true);
-    const formData = new FormData();
-    formData.append('file', file);
     try {
-      const res = await axiosInstance.post('products/bulk-upload/', formData, {
-        headers: { 'Content-Type': 'multipart/form-data' },
-      });
-      setUploadResults(res.data);
-      fetchProducts();
+      await step();
     } catch (err) {
       setUploadResults({ error: err.response?.data?.error || 'Upload failed' });
     } finally {
       setUploading(false);
+      setUploadProgress(null);
     }
   };
 
+  const jobResults = (job) => ({
+    created: job.created,
+    updated: job.updated,
+    unchanged: job.unchanged,
+    errors: job.errors,
+    message: job.error || undefined,
+  });
+
+  // A chosen file is first checked with a dry run, so the manager sees what
+  // would change before anything is written. Sheets over the synchronous row
+  // cap are previewed by the background worker instead.
+  const handleFileUpload = (e) => {
+    const file = e.target.files[0];
+    if (!file) return;
+    e.target.value = '';
+    setUploadPreview(null);
+    runUpload(async () => {
+      try {
+        const res = await postUpload(file, { dry_run: 'true' });
+        setUploadPreview({ ...res.data, file });
+      } catch (err) {
+        if (err.response?.data?.errors) {
+          setUploadResults(err.response.data);
+          return;
+        }
+        if (err.response?.data?.code !== 'too_many_rows') throw err;
+        const queued = await postUpload(file, { mode: 'background', dry_run: 'true' });
+        setUploadProgress(0);
+        const job = await waitForImport(queued.data.id);
+        if (job.status === 'FAILED') {
+          setUploadResults({ error: job.error || 'Upload failed' });
+        } else if (job.error_count > 0) {
+          setUploadResults({
+            ...jobResults(job),
+            created: 0,
+            updated: 0,
+            unchanged: 0,
+            message: `${job.error_count} row(s) failed validation. No products were saved. Fix the errors and re-upload.`,
+          });
+        } else {
+          setUploadPreview({ ...jobResults(job), ...job.preview, jobId: job.id });
+        }
+      }
+    });
+  };
+
+  const handleConfirmImport = () => {
+    const { file, jobId } = uploadPreview;
+    setUploadPreview(null);
+    runUpload(async () => {
+      if (jobId) {
+        await axiosInstance.post(`products/import-jobs/${jobId}/commit/`);
+        setUploadProgress(0);
+        setUploadResults(jobResults(await waitForImport(jobId)));
+      } else {
+        try {
+          const res = await postUpload(file);
+          setUploadResults(res.data);
+        } catch (err) {
+          if (!err.response?.data?.errors) throw err;
+          setUploadResults(err.response.data);
+        }
+      }
+      fetchProducts();
+    });
+  };
+
   const handleSort = (column) => {
     setSortConfig(prev => ({
       column,
@@ -404,10 +501,13 @@ function ProductsPage() {
                       <Button variant="outlined" startIcon={<DownloadIcon />} onClick={handleDownloadTemplate}>
                         Template
                       </Button>
+                      <Button variant="outlined" startIcon={<DownloadIcon />} onClick={handleExportCsv}>
+                        Export CSV
+                      </Button>
                       <Button variant="outlined" startIcon={<UploadIcon />} onClick={() => fileInputRef.current?.click()}>
-                        Upload Excel
+                        Upload File
                       </Button>
-                      <input ref={fileInputRef} type="file" accept=".xlsx,.xls" style={{ display: 'none' }} onChange={handleFileUpload} />
+                      <input ref={fileInputRef} type="file" accept=".xlsx,.xls,.csv" style={{ display: 'none' }} onChange={handleFileUpload} />
                     </>
                   )}
                   <Button variant="contained" startIcon={<AddIcon />} onClick={() => setAddModalOpen(true)} sx={{ borderRadius: 2 }}>
@@ -778,13 +878,43 @@ function ProductsPage() {
       />
 
       {/* Bulk Upload Results Dialog */}
-      <Dialog open={uploadDialogOpen} onClose={() => !uploading && setUploadDialogOpen(false)} maxWidth="sm" fullWidth>
+      <Dialog open={uploadDialogOpen} onClose={() => { if (!uploading) { setUploadDialogOpen(false); setUploadPreview(null); } }} maxWidth="sm" fullWidth>
         <DialogTitle>Bulk Product Upload</DialogTitle>
         <DialogContent>
           {uploading ? (
             <Box sx={{ display: 'flex', flexDirection: 'column', alignItems: 'center', py: 4, gap: 2 }}>
               <CircularProgress />
-              <Typography>Processing your file...</Typography>
+              <Typography>
+                {uploadProgress === null ? 'Processing your file...' : `${uploadProgress} rows processed...`}
+              </Typography>
+            </Box>
+          ) : uploadPreview ? (
+            <Box>
+              <Alert severity="info" sx={{ mb: 2 }}>
+                This file will create {uploadPreview.created}, update {uploadPreview.updated} and
+                leave {uploadPreview.unchanged} product(s) unchanged.
+              </Alert>
+              {uploadPreview.changes.length > 0 && (
+                <List dense sx={{ maxHeight: 260, overflow: 'auto', borderRadius: 1, border: '1px solid', borderColor: 'divider' }}>
+                  {uploadPreview.changes.map((c) => (
+                    <ListItem key={c.barcode} divider>
+                      <ListItemText
+                        primary={`Row ${c.row}: ${c.name}`}
+                        secondary={Object.entries(c.changes)
+                          .map(([field, { old, new: value }]) => `${field}: ${old ?? '—'} → ${value ?? '—'}`)
+                          .join(', ')}
+                        primaryTypographyProps={{ fontWeight: 'medium', variant: 'body2' }}
+                        secondaryTypographyProps={{ variant: 'caption' }}
+                      />
+                    </ListItem>
+                  ))}
+                </List>
+              )}
+              {uploadPreview.changes.length < uploadPreview.updated && (
+                <Typography variant="caption" color="text.secondary">
+                  Showing the first {uploadPreview.changes.length} of {uploadPreview.updated} updates.
+                </Typography>
+              )}
             </Box>
           ) : uploadResults?.error && !uploadResults?.errors ? (
             <Alert severity="error">{uploadResults.error}</Alert>
@@ -795,7 +925,8 @@ function ProductsPage() {
               )}
               {!uploadResults.message && (
                 <Alert severity="success" sx={{ mb: 2 }}>
-                  Upload complete — {uploadResults.created} created, {uploadResults.updated} updated.
+                  Upload complete — {uploadResults.created} created, {uploadResults.updated} updated
+                  {uploadResults.unchanged ? `, ${uploadResults.unchanged} unchanged` : ''}.
                 </Alert>
               )}
               {uploadResults.errors?.length > 0 && (
@@ -821,7 +952,18 @@ function ProductsPage() {
           ) : null}
         </DialogContent>
         <DialogActions>
-          <Button onClick={() => setUploadDialogOpen(false)} disabled={uploading}>Close</Button>
+          <Button onClick={() => { setUploadDialogOpen(false); setUploadPreview(null); }} disabled={uploading}>
+            {uploadPreview ? 'Cancel' : 'Close'}
+          </Button>
+          {uploadPreview && (
+            <Button
+              variant="contained"
+              onClick={handleConfirmImport}
+              disabled={uploading || uploadPreview.created + uploadPreview.updated === 0}
+            >
+              Import
+            </Button>
+          )}
         </DialogActions>
       </Dialog>
 
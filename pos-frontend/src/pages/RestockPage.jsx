@@ -20,7 +20,9 @@ import {
   CardContent,
   Grid,
   TableContainer,
+  IconButton,
 } from '@mui/material';
+import { Delete as DeleteIcon } from '@mui/icons-material';
 
 const Restock = () => {
   const [products, setProducts] = useState([]);
@@ -28,6 +30,8 @@ const Restock = () => {
   const [quantity, setQuantity] = useState('');
   const [feedback, setFeedback] = useState({ open: false, message: '', severity: 'info' });
   const [restockHistory, setRestockHistory] = useState([]);
+  const [delivery, setDelivery] = useState([]);
+  const [submitting, setSubmitting] = useState(false);
 
   // Load products and history
  const loadProducts = () => {
@@ -61,30 +65,58 @@ const loadRestockHistory = () => {
     loadRestockHistory();
   }, []);
 
-  const handleRestock = () => {
+  const handleAddLine = () => {
     if (!productId || !quantity || quantity <= 0) {
       setFeedback({ open: true, message: 'Please select a product and enter a valid quantity', severity: 'warning' });
       return;
     }
 
-    axiosInstance.post('/restock/', { product_id: productId, quantity })
+    const product = products.find(p => p.id === productId);
+    setDelivery(prev => {
+      const existing = prev.find(line => line.product_id === productId);
+      if (existing) {
+        return prev.map(line => line.product_id === productId
+          ? { ...line, quantity: line.quantity + Number(quantity) }
+          : line);
+      }
+      return [...prev, { product_id: productId, name: product?.name || '', quantity: Number(quantity) }];
+    });
+    setQuantity('');
+    setProductId('');
+  };
+
+  const handleRemoveLine = (id) => {
+    setDelivery(prev => prev.filter(line => line.product_id !== id));
+  };
+
+  // The whole delivery goes in one request and one transaction
+  const handleReceiveDelivery = () => {
+    if (delivery.length === 0) return;
+
+    setSubmitting(true);
+    axiosInstance.post('/restock/batch/', {
+      items: delivery.map(({ product_id, quantity }) => ({ product_id, quantity })),
+    })
       .then(res => {
         setFeedback({ open: true, message: res.data.message, severity: 'success' });
-        setQuantity('');
-        setProductId('');
-        
+        setDelivery([]);
+
         // Refresh both products and history data
         loadProducts(); // This updates the products list with new stock numbers
         loadRestockHistory(); // This updates the history table
       })
-     .catch(err => {
-      console.error('Restock failed:', err);
-      const errorMsg = err.response?.data?.error || 
-                      (err.response?.status === 403 ? 
-                       'Permission denied: Cannot restock products' : 
-                       'Restock failed');
-      setFeedback({ open: true, message: errorMsg, severity: 'error' });
-    });
+      .catch(err => {
+        console.error('Restock failed:', err);
+        const lineErrors = err.response?.data?.errors;
+        const errorMsg = lineErrors?.length
+          ? lineErrors.map(e => `Line ${e.line}: ${e.error}`).join('; ')
+          : err.response?.data?.error ||
+            (err.response?.status === 403 ?
+             'Permission denied: Cannot restock products' :
+             'Restock failed');
+        setFeedback({ open: true, message: errorMsg, severity: 'error' });
+      })
+      .finally(() => setSubmitting(false));
   };
 
   return (
@@ -105,7 +137,7 @@ const loadRestockHistory = () => {
           <Card sx={{ boxShadow: 3, borderRadius: 2 }}>
             <CardContent sx={{ p: 3 }}>
               <Typography variant="h6" gutterBottom sx={{ fontWeight: 'bold', mb: 3 }}>
-                Add Stock
+                Receive Delivery
               </Typography>
               
               <Box sx={{ display: 'flex', flexDirection: 'column', gap: 3 }}>
@@ -137,9 +169,51 @@ const loadRestockHistory = () => {
                   inputProps={{ min: 1 }}
                 />
 
+                <Button
+                  variant="outlined"
+                  onClick={handleAddLine}
+                  size="large"
+                  sx={{ py: 1.5 }}
+                >
+                  Add to Delivery
+                </Button>
+
+                {delivery.length > 0 && (
+                  <Box sx={{ border: '1px solid', borderColor: 'divider', borderRadius: 1 }}>
+                    {delivery.map(line => (
+                      <Box
+                        key={line.product_id}
+                        sx={{
+                          display: 'flex',
+                          justifyContent: 'space-between',
+                          alignItems: 'center',
+                          px: 2,
+                          py: 0.5,
+                          borderBottom: '1px solid',
+                          borderColor: 'divider',
+                          '&:last-child': { borderBottom: 'none' }
+                        }}
+                      >
+                        <Typography variant="body2" sx={{ fontWeight: 'medium' }}>
+                          {line.name}
+                        </Typography>
+                        <Box sx={{ display: 'flex', alignItems: 'center', gap: 1 }}>
+                          <Typography variant="body2" sx={{ color: 'success.main', fontWeight: 'bold' }}>
+                            +{line.quantity}
+                          </Typography>
+                          <IconButton size="small" onClick={() => handleRemoveLine(line.product_id)}>
+                            <DeleteIcon fontSize="small" />
+                          </IconButton>
+                        </Box>
+                      </Box>
+                    ))}
+                  </Box>
+                )}
+
                 <Button
                   variant="contained"
-                  onClick={handleRestock}
+                  onClick={handleReceiveDelivery}
+                  disabled={delivery.length === 0 || submitting}
                   size="large"
                   sx={{
                     py: 1.5,
@@ -149,7 +223,7 @@ const loadRestockHistory = () => {
                     },
                   }}
                 >
-                  Restock Product
+                  {submitting ? 'Receiving...' : `Receive Delivery (${delivery.length} product${delivery.length === 1 ? '' : 's'})`}
                 </Button>
               </Box>
             </CardContent>
@@ -83,6 +83,8 @@ const SalesReport = () => {
   });
   const [loading, setLoading] = useState(false);
   const [sales, setSales] = useState([]);
+  const [salesCursor, setSalesCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [summary, setSummary] = useState([]);
   const [analytics, setAnalytics] = useState(null);
   const [activeTab, setActiveTab] = useState(0);
@@ -113,26 +115,31 @@ const SalesReport = () => {
     }
   }, [filters.period]);
 
+  const reportParams = () => ({
+    start_date: filters.start_date,
+    end_date: filters.end_date,
+    cashier_id: filters.cashier,
+    product_id: filters.product,
+  });
+
   const fetchReport = async () => {
     setLoading(true);
     try {
-      const params = {
-        start_date: filters.start_date,
-        end_date: filters.end_date,
-        cashier_id: filters.cashier,
-        product_id: filters.product,
-      };
+      const params = reportParams();
 
-      const requests = [axiosInstance.get("sales-report/", { params })];
+      const requests = [
+        axiosInstance.get("sales-report/", { params }),
+        axiosInstance.get("sales-report/", { params: { ...params, mode: "detail" } }),
+      ];
       if (canViewMargin) {
         requests.push(axiosInstance.get("margin-report/", { params }).catch(() => ({ data: null })));
       }
-      const [res, marginRes] = await Promise.all(requests);
-      setSales(res.data.sales || []);
+      const [res, detailRes, marginRes] = await Promise.all(requests);
+      setSales(detailRes.data.results || []);
+      setSalesCursor(detailRes.data.next);
       setSummary(res.data.daily_summary || []);
       setMarginData(canViewMargin ? (marginRes?.data ?? null) : null);
-      calculateAnalytics(res.data.sales || [], res.data.daily_summary || []);
-      calculateQuickStats(res.data.sales || [], res.data.daily_summary || []);
+      calculateAnalytics(res.data);
     } catch (err) {
       console.error("Error fetching report", err);
     } finally {
@@ -140,168 +147,93 @@ const SalesReport = () => {
     }
   };
 
-  const calculateAnalytics = (salesData, summaryData) => {
-    if (!salesData.length) {
+  // Next page of transactions for the Sales Data tab
+  const fetchMoreSales = async () => {
+    if (!salesCursor) return;
+    setLoadingMore(true);
+    try {
+      const res = await axiosInstance.get(salesCursor);
+      setSales(prev => [...prev, ...(res.data.results || [])]);
+      setSalesCursor(res.data.next);
+    } catch (err) {
+      console.error("Error fetching more sales", err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  // Builds the same shapes the charts and tables use from the server-side aggregates
+  const calculateAnalytics = (report) => {
+    const totals = report.totals || {};
+    if (!totals.transactions) {
       setAnalytics(null);
+      setQuickStats(null);
       return;
     }
 
-    // Product performance
     const productPerformance = {};
-    const categoryPerformance = {};
-    
-    salesData.forEach(sale => {
-      if (sale.items && Array.isArray(sale.items)) {
-        sale.items.forEach(item => {
-          // Safely extract product information - handle Django model objects
-          let productName = 'Unknown Product';
-          let category = 'Uncategorized';
-          
-          // Handle different possible structures of item.product
-          if (typeof item.product === 'string') {
-            productName = item.product;
-          } else if (typeof item.product === 'object' && item.product !== null) {
-            // Handle Django model object - it could have nested structure
-            productName = item.product.name || 
-                         item.product.product_name || 
-                         (item.product.product && item.product.product.name) || 
-                         'Unknown Product';
-            
-            // Extract category name from category object (like in ProductsPage: product.category.name)
-            if (item.product.category) {
-              if (typeof item.product.category === 'string') {
-                category = item.product.category;
-              } else if (typeof item.product.category === 'object') {
-                category = item.product.category.name || 
-                          item.product.category.category_name ||
-                          'Uncategorized';
-              }
-            } else {
-              category = 'Uncategorized';
-            }
-          }
-          
-          // Ensure we have strings and handle null/undefined
-          productName = String(productName || 'Unknown Product');
-          category = String(category || 'Uncategorized');
-
-          // Product performance
-          if (!productPerformance[productName]) {
-            productPerformance[productName] = {
-              quantity: 0,
-              revenue: 0,
-              transactions: 0,
-              category: category
-            };
-          }
-          const quantity = Number(item.quantity) || 0;
-          const price = Number(item.price_at_sale) || 0;
-          productPerformance[productName].quantity += quantity;
-          productPerformance[productName].revenue += quantity * price;
-          productPerformance[productName].transactions += 1;
+    (report.top_products || []).forEach(p => {
+      productPerformance[p.name || 'Unknown Product'] = {
+        quantity: p.quantity,
+        revenue: p.revenue,
+        transactions: p.transactions,
+        category: p.category,
+      };
+    });
 
-          // Category performance
-          if (!categoryPerformance[category]) {
-            categoryPerformance[category] = {
-              revenue: 0,
-              transactions: 0,
-              products: new Set()
-            };
-          }
-          categoryPerformance[category].revenue += quantity * price;
-          categoryPerformance[category].transactions += 1;
-          categoryPerformance[category].products.add(productName);
-        });
-      }
+    const categoryPerformance = {};
+    (report.by_category || []).forEach(c => {
+      categoryPerformance[c.name] = {
+        revenue: c.revenue,
+        transactions: c.transactions,
+        productCount: c.product_count,
+      };
     });
 
-    // Cashier performance
     const cashierPerformance = {};
-    const hourlyPerformance = Array(24).fill({ revenue: 0, transactions: 0 });
-    
-    salesData.forEach(sale => {
-      const cashierName = sale.cashier || 'Unknown Cashier';
-      const saleHour = new Date(sale.created_at).getHours();
-      const totalAmount = Number(sale.total_amount) || 0;
-
-      // Cashier performance
-      if (!cashierPerformance[cashierName]) {
-        cashierPerformance[cashierName] = {
-          totalSales: 0,
-          transactions: 0,
-          averageSale: 0,
-          itemsSold: 0
-        };
-      }
-      cashierPerformance[cashierName].totalSales += totalAmount;
-      cashierPerformance[cashierName].transactions += 1;
-      cashierPerformance[cashierName].itemsSold += (sale.items || []).reduce((sum, item) => sum + (Number(item.quantity) || 0), 0);
-
-      // Hourly performance
-      hourlyPerformance[saleHour] = {
-        revenue: (hourlyPerformance[saleHour]?.revenue || 0) + totalAmount,
-        transactions: (hourlyPerformance[saleHour]?.transactions || 0) + 1
+    (report.by_cashier || []).forEach(c => {
+      cashierPerformance[c.cashier] = {
+        totalSales: c.total_sales,
+        transactions: c.transactions,
+        averageSale: c.average_sale,
+        itemsSold: c.items_sold,
+        itemsPerTransaction: c.items_per_transaction,
       };
     });
 
-    // Calculate averages
-    Object.keys(cashierPerformance).forEach(cashier => {
-      const data = cashierPerformance[cashier];
-      data.averageSale = data.transactions > 0 ? data.totalSales / data.transactions : 0;
-      data.itemsPerTransaction = data.transactions > 0 ? data.itemsSold / data.transactions : 0;
-    });
+    const hourlyPerformance = (report.by_hour || []).map(h => ({
+      revenue: h.revenue,
+      transactions: h.transactions,
+    }));
 
-    // Calculate category stats
-    Object.keys(categoryPerformance).forEach(category => {
-      categoryPerformance[category].productCount = categoryPerformance[category].products.size;
-    });
+    const topProducts = Object.entries(productPerformance);
+    const topCashiers = Object.entries(cashierPerformance);
+    const topCategories = Object.entries(categoryPerformance);
 
     setAnalytics({
       productPerformance,
       cashierPerformance,
       categoryPerformance,
       hourlyPerformance,
-      topProducts: Object.entries(productPerformance)
-        .sort((a, b) => b[1].revenue - a[1].revenue)
-        .slice(0, 15),
-      topCashiers: Object.entries(cashierPerformance)
-        .sort((a, b) => b[1].totalSales - a[1].totalSales),
-      topCategories: Object.entries(categoryPerformance)
-        .sort((a, b) => b[1].revenue - a[1].revenue)
+      topProducts,
+      topCashiers,
+      topCategories,
     });
-  };
-
-  const calculateQuickStats = (salesData, summaryData) => {
-    if (!salesData.length) {
-      setQuickStats(null);
-      return;
-    }
-
-    const totalRevenue = salesData.reduce((sum, sale) => {
-      return sum + (Number(sale.total_amount) || 0);
-    }, 0);
-    
-    const totalTransactions = salesData.length;
-    const averageTransaction = totalTransactions > 0 ? totalRevenue / totalTransactions : 0;
-    
-    // Calculate total items sold
-    const totalItems = salesData.reduce((sum, sale) => {
-      return sum + ((sale.items || []).reduce((itemSum, item) => itemSum + (Number(item.quantity) || 0), 0));
-    }, 0);
 
+    const totalRevenue = Number(totals.revenue) || 0;
     const previousPeriodRevenue = totalRevenue * 0.85;
     const revenueGrowth = previousPeriodRevenue > 0 ? 
       ((totalRevenue - previousPeriodRevenue) / previousPeriodRevenue) * 100 : 0;
 
     setQuickStats({
       totalRevenue,
-      totalTransactions,
-      totalItems,
-      averageTransaction,
+      totalTransactions: totals.transactions,
+      totalItems: totals.units,
+      averageTransaction: Number(totals.average_sale) || 0,
       revenueGrowth,
-      bestSellingProduct: analytics?.topProducts?.[0]?.[0] || 'N/A',
-      topCashier: analytics?.topCashiers?.[0]?.[0] || 'N/A',
-      topCategory: analytics?.topCategories?.[0]?.[0] || 'N/A'
+      bestSellingProduct: topProducts[0]?.[0] || 'N/A',
+      topCashier: topCashiers[0]?.[0] || 'N/A',
+      topCategory: topCategories[0]?.[0] || 'N/A'
     });
   };
 
@@ -331,37 +263,33 @@ const SalesReport = () => {
     }));
   };
 
-  const exportItemizedCSV = () => {
+  const exportItemized = async (type) => {
     if (sales.length === 0) {
       alert("No sales data to export.");
       return;
     }
 
-    const csvData = sales.flatMap(tx =>
-      (tx.items || []).map(item => {
-        // Extract product name safely
-        let productName = 'Unknown';
-        if (typeof item.product === 'string') {
-          productName = item.product;
-        } else if (typeof item.product === 'object' && item.product !== null) {
-          productName = item.product.name || 'Unknown';
-        }
-
-        return {
-          transaction_id: tx.id,
-          cashier: tx.cashier,
-          created_at: tx.created_at,
-          product_name: productName,
-          quantity: item.quantity,
-          price_at_sale: item.price_at_sale,
-          total: (Number(item.quantity) || 0) * (Number(item.price_at_sale) || 0),
+    // The server streams every line in range, so large exports stay off the page
+    try {
+      let res = await axiosInstance.get("sales/export/", {
+        params: { ...reportParams(), type },
+        responseType: "blob",
+      });
+      if (res.status === 202) {
+        // Too many lines to build in the request: the worker builds the file
+        let job = JSON.parse(await res.data.text());
+        while (job.status !== "DONE" && job.status !== "FAILED") {
+          await new Promise(resolve => setTimeout(resolve, 2000));
+          ({ data: job } = await axiosInstance.get(`reports/jobs/${job.id}/`));
         }
-      })
-    );
-
-    const csv = Papa.unparse(csvData);
-    const blob = new Blob([csv], { type: "text/csv;charset=utf-8;" });
-    saveAs(blob, `sales_itemized_${new Date().toISOString().slice(0, 10)}.csv`);
+        if (job.status === "FAILED") throw new Error(job.error);
+        res = await axiosInstance.get(`reports/jobs/${job.id}/result/`, { responseType: "blob" });
+      }
+      saveAs(res.data, `sales_itemized_${new Date().toISOString().slice(0, 10)}.${type}`);
+    } catch (error) {
+      console.error("Export failed:", error);
+      alert("Export failed. Please try again.");
+    }
   };
 
   const exportSummaryCSV = () => {
@@ -981,12 +909,20 @@ const SalesReport = () => {
       <Box display="flex" gap={1} flexWrap="wrap" mb={3}>
         <Button 
           variant="outlined" 
-          onClick={exportItemizedCSV}
+          onClick={() => exportItemized("csv")}
           startIcon={<DownloadIcon />}
           disabled={sales.length === 0}
         >
           Itemized CSV
         </Button>
+        <Button 
+          variant="outlined" 
+          onClick={() => exportItemized("xlsx")}
+          startIcon={<DownloadIcon />}
+          disabled={sales.length === 0}
+        >
+          Itemized Excel
+        </Button>
         <Button 
           variant="outlined" 
           onClick={exportSummaryCSV}
@@ -1134,7 +1070,7 @@ const SalesReport = () => {
                 <Card>
                   <CardContent>
                     <Typography variant="h6" gutterBottom>
-                      Sales Transactions ({sales.length} total)
+                      Sales Transactions ({formatNumber(quickStats?.totalTransactions || sales.length)} total)
                     </Typography>
                     <TableContainer sx={{ maxHeight: 400, overflow: "auto" }}>
                       <Table size="small">
@@ -1170,6 +1106,13 @@ const SalesReport = () => {
                         </TableBody>
                       </Table>
                     </TableContainer>
+                    {salesCursor && (
+                      <Box textAlign="center" mt={2}>
+                        <Button variant="outlined" onClick={fetchMoreSales} disabled={loadingMore}>
+                          {loadingMore ? "Loading..." : `Load more (${sales.length} shown)`}
+                        </Button>
+                      </Box>
+                    )}
                   </CardContent>
                 </Card>
               </Grid>
@@ -1242,6 +1185,49 @@ const SalesReport = () => {
                   </Grid>
                 )}
 
+                {/* Per-Category Margin Table */}
+                {marginData.by_category?.length > 0 && (
+                  <Grid item size={{ xs: 12 }}>
+                    <Card>
+                      <CardContent>
+                        <Typography variant="h6" gutterBottom>Category Margin Breakdown</Typography>
+                        <TableContainer>
+                        <Table size="small">
+                          <TableHead>
+                            <TableRow>
+                              <TableCell>Category</TableCell>
+                              <TableCell align="right">Units</TableCell>
+                              <TableCell align="right">Revenue</TableCell>
+                              <TableCell align="right" sx={{ display: { xs: 'none', sm: 'table-cell' } }}>Cost</TableCell>
+                              <TableCell align="right" sx={{ display: { xs: 'none', sm: 'table-cell' } }}>Profit</TableCell>
+                              <TableCell align="right">Margin</TableCell>
+                            </TableRow>
+                          </TableHead>
+                          <TableBody>
+                            {marginData.by_category.map((c) => (
+                              <TableRow key={c.name} hover>
+                                <TableCell><Typography variant="body2" fontWeight="medium">{c.name}</Typography></TableCell>
+                                <TableCell align="right">{c.units_sold}</TableCell>
+                                <TableCell align="right" sx={{ color: 'primary.main', fontWeight: 'bold' }}>{formatCurrency(c.revenue)}</TableCell>
+                                <TableCell align="right" sx={{ display: { xs: 'none', sm: 'table-cell' }, color: 'warning.main' }}>{formatCurrency(c.cost)}</TableCell>
+                                <TableCell align="right" sx={{ display: { xs: 'none', sm: 'table-cell' }, color: c.gross_profit >= 0 ? 'success.main' : 'error.main', fontWeight: 'bold' }}>{formatCurrency(c.gross_profit)}</TableCell>
+                                <TableCell align="right">
+                                  <Chip
+                                    label={`${c.margin_pct}%`}
+                                    size="small"
+                                    color={c.margin_pct >= 30 ? 'success' : c.margin_pct >= 15 ? 'warning' : 'error'}
+                                  />
+                                </TableCell>
+                              </TableRow>
+                            ))}
+                          </TableBody>
+                        </Table>
+                        </TableContainer>
+                      </CardContent>
+                    </Card>
+                  </Grid>
+                )}
+
                 {/* Per-Product Margin Table */}
                 <Grid item size={{ xs: 12 }}>
                   <Card>